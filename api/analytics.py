@@ -0,0 +1,36 @@
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from config.settings import RollupGranularity, settings
+from middleware.dependencies import get_read_db, require_privilege
+from services.order_rollup import AsyncOrderRollupService, bucket_count
+from validators.analytics import OrderRollupResponse
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+
+# Rollup buckets hold naive order_date values; aware datetimes are converted to UTC first
+def naive_utc(moment: datetime) -> datetime:
+    return moment if moment.tzinfo is None else moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+# Endpoint: Order counts and amounts per hour or day of order_date, in total and per status (requires analytics:read)
+# Reads the order_rollups table: a year of daily buckets is a few hundred rows, whatever the number of orders.
+# Buckets are whole: the first one starts at or before `from`, the last one starts before `to`.
+@router.get("/orders", response_model=OrderRollupResponse)
+async def get_order_rollups(
+    date_from: datetime = Query(..., alias="from", description="Start of the range (inclusive)"),
+    date_to: datetime = Query(..., alias="to", description="End of the range (exclusive)"),
+    granularity: RollupGranularity = RollupGranularity.day,
+    db = Depends(get_read_db),
+    current_user = Depends(require_privilege("analytics:read"))
+):
+    date_from, date_to = naive_utc(date_from), naive_utc(date_to)
+    if date_from >= date_to:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'from' must be before 'to'")
+    if bucket_count(granularity, date_from, date_to) > settings.ANALYTICS_MAX_BUCKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.ANALYTICS_MAX_BUCKETS} buckets per request; narrow the range or use a larger granularity",
+        )
+    buckets = await AsyncOrderRollupService(db).get_buckets(granularity, date_from, date_to)
+    return {"granularity": granularity, "date_from": date_from, "date_to": date_to, "buckets": buckets}
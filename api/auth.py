@@ -1,25 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
 from datetime import timedelta
-from database.models import User
-from middleware.dependencies import get_db
+from middleware.dependencies import get_async_db
+from rate_limit import auth_rate_limiter, AUTH_IP_LIMIT, AUTH_USERNAME_LIMIT
 from security import verify_token
-from services.auth import AuthService
+from services.auth import AsyncAuthService
+from services.user import AsyncUserService
 from config.settings import settings
 from validators.auth import RefreshTokenRequest, TokenResponse
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+def client_ip(request: Request) -> str:
+    # Behind a proxy, run uvicorn with --proxy-headers so this is the real client address
+    return request.client.host if request.client else "unknown"
+
+
 # Endpoint: Create access token
 @router.post("/")
-def login_for_access_token(
+async def login_for_access_token(
+        request: Request,
         form_data: OAuth2PasswordRequestForm = Depends(),
-        db: Session = Depends(get_db)
+        db = Depends(get_async_db)
 ):
-    auth_service = AuthService(db)
+    # Rejected before the user lookup and the bcrypt verify, so a flood of attempts costs no hashing
+    if settings.AUTH_RATE_LIMIT_ENABLED:
+        await auth_rate_limiter.check((AUTH_IP_LIMIT, client_ip(request)), (AUTH_USERNAME_LIMIT, form_data.username.lower()))
+    auth_service = AsyncAuthService(db)
     try:
-        user = auth_service.authenticate_user(form_data.username, form_data.password)
+        user = await auth_service.authenticate_user(form_data.username, form_data.password)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(e))
 
@@ -41,10 +50,13 @@ def login_for_access_token(
 
 # Endpoint: Create refresh token
 @router.post("/refresh", response_model=TokenResponse)
-def refresh_access_token(
+async def refresh_access_token(
+        request: Request,
         refresh_data: RefreshTokenRequest,
-        db: Session = Depends(get_db)
+        db = Depends(get_async_db)
 ):
+    if settings.AUTH_RATE_LIMIT_ENABLED:
+        await auth_rate_limiter.check((AUTH_IP_LIMIT, client_ip(request)))
     # Verify the refresh token
     payload = verify_token(refresh_data.refresh_token, is_refresh=True)
     user_id = payload.get("sub")
@@ -52,11 +64,11 @@ def refresh_access_token(
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
 
     # Query the user from the database
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    user = await AsyncUserService(db).get_user(int(user_id))
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
 
-    auth_service = AuthService(db)
+    auth_service = AsyncAuthService(db)
     # Create new tokens for the user
     new_access_token = auth_service.create_access_token(user)
     new_refresh_token = auth_service.create_refresh_token(user)
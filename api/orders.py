@@ -1,106 +1,241 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from middleware.dependencies import get_db, get_current_user
-from services.order import OrderService, OrderCreate, OrderUpdate
-from validators.orders import OrderResponse
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from config.settings import settings
+from pydantic import ValidationError
+from fastapi.responses import StreamingResponse
+from database.replicas import read_session_factories
+from middleware.dependencies import get_async_db, get_read_db, get_current_user, get_page_request, get_order_filter, get_privilege_matrix, require_privilege
+from services.etag import make_etag, page_etag, etag_matches, set_etag, not_modified
+from services.export import ExportFormat, EXPORT_MEDIA_TYPES, SERIALIZERS
+from services.order import OrderService, AsyncOrderService, OrderCreate, OrderUpdate, OrderFilter, EXPORT_COLUMNS, ORDER_RESPONSE_COLUMNS, ORDER_RESPONSE_VERSION_COLUMNS, ORDER_VERSION_COLUMNS
+from services.order_summary import AsyncOrderSummaryService
+from services.pagination import PageRequest
+from services.role import PrivilegeMatrix
+from services.serialization import page_response
+from validators.orders import OrderResponse, OrderPage, OrderBatchCreate, OrderBatchResponse, OrderBulkStatusUpdate, OrderBulkStatusResponse, OrderSummaryResponse
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
 # Endpoint: Create a new order for the logged-in customer
 @router.post("/", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
-def create_order(
+async def create_order(
     order_data: OrderCreate,
-    db: Session = Depends(get_db),
+    db = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
-    service = OrderService(db)
+    service = AsyncOrderService(db)
     # The order is created under the currently logged-in customer's ID
-    order = service.create_order(current_user.id, order_data)
+    order = await service.create_order(current_user.id, order_data)
     return order
 
-# Endpoint: List orders placed by the currently logged-in customer
-@router.get("/me", response_model=list[OrderResponse])
-def list_my_orders(
-    db: Session = Depends(get_db),
+# Endpoint: Create several orders for the logged-in customer in one statement and transaction
+# Invalid items are reported by index and skipped; the valid ones are created.
+@router.post("/batch", response_model=OrderBatchResponse, status_code=status.HTTP_201_CREATED)
+async def create_orders_batch(
+    batch: OrderBatchCreate,
+    db = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
-    service = OrderService(db)
-    # Fetch orders placed by the currently logged-in user (using current_user.id)
-    orders = service.list_orders_by_user(current_user.id)
-    return orders
-
-# Endpoint: List orders placed by a specific user (Admin only)
-@router.get("/users/{user_id}", response_model=list[OrderResponse])
-def list_orders_by_user(
-    user_id: int,
-    db: Session = Depends(get_db),
+    valid, errors = [], []
+    for index, item in enumerate(batch.items):
+        try:
+            valid.append(OrderCreate.model_validate(item))
+        except ValidationError as e:
+            errors.append({"index": index, "errors": e.errors(include_url=False, include_context=False)})
+    if not valid:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=errors)
+    service = AsyncOrderService(db)
+    orders = await service.create_orders(current_user.id, valid)
+    return {"created": orders, "errors": errors}
+
+# Endpoint: List orders placed by the currently logged-in customer
+# The page carries an ETag; with If-None-Match only the page's (id, updated_at, status) rows are read
+# (index-only without filters) and 304 is returned when none of them changed
+@router.get("/me", response_model=OrderPage)
+async def list_my_orders(
+    request: Request,
+    response: Response,
+    page: PageRequest = Depends(get_page_request),
+    filters: OrderFilter = Depends(get_order_filter),
+    db = Depends(get_read_db),
     current_user = Depends(get_current_user)
 ):
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Not authorized")
-    service = OrderService(db)
-    orders = service.list_orders_by_user(user_id)
-    return orders
-
-# Endpoint: List all orders (Admin only)
-@router.get("/", response_model=list[OrderResponse])
-def list_all_orders(
-    db: Session = Depends(get_db),
+    service = AsyncOrderService(db)
+    if "if-none-match" in request.headers:
+        versions, next_cursor = await service.list_orders_by_user(current_user.id, page, filters, columns=ORDER_VERSION_COLUMNS)
+        etag = page_etag(versions, next_cursor)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+    if settings.FAST_LIST_SERIALIZATION:
+        rows, next_cursor = await service.list_orders_by_user(current_user.id, page, filters, columns=ORDER_RESPONSE_VERSION_COLUMNS)
+        fast_response = page_response(rows, next_cursor, fields=len(ORDER_RESPONSE_COLUMNS))
+        set_etag(fast_response, page_etag(((row.id, row.updated_at, row.status) for row in rows), next_cursor))
+        return fast_response
+    # Fetch one page of orders placed by the currently logged-in user (using current_user.id)
+    orders, next_cursor = await service.list_orders_by_user(current_user.id, page, filters)
+    set_etag(response, page_etag(((order.id, order.updated_at, order.status) for order in orders), next_cursor))
+    return {"items": orders, "next_cursor": next_cursor}
+
+# Endpoint: Order count and amounts of the logged-in customer, in total and per status
+# One primary key lookup in user_order_summary, whatever the number of orders
+@router.get("/me/summary", response_model=OrderSummaryResponse)
+async def get_my_order_summary(
+    db = Depends(get_read_db),
     current_user = Depends(get_current_user)
 ):
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Not authorized")
-    service = OrderService(db)
-    orders = service.list_all_orders()  # Returns a list of orders from the DB
-    return orders
+    return await AsyncOrderSummaryService(db).get_summary(current_user.id)
+
+# Endpoint: List orders placed by a specific user (requires orders:read_all)
+@router.get("/users/{user_id}", response_model=OrderPage)
+async def list_orders_by_user(
+    user_id: int,
+    page: PageRequest = Depends(get_page_request),
+    filters: OrderFilter = Depends(get_order_filter),
+    db = Depends(get_read_db),
+    current_user = Depends(require_privilege("orders:read_all"))
+):
+    service = AsyncOrderService(db)
+    if settings.FAST_LIST_SERIALIZATION:
+        rows, next_cursor = await service.list_orders_by_user(user_id, page, filters, columns=ORDER_RESPONSE_COLUMNS)
+        return page_response(rows, next_cursor)
+    orders, next_cursor = await service.list_orders_by_user(user_id, page, filters)
+    return {"items": orders, "next_cursor": next_cursor}
+
+# Endpoint: Order count and amounts of a specific user (requires orders:read_all)
+@router.get("/users/{user_id}/summary", response_model=OrderSummaryResponse)
+async def get_user_order_summary(
+    user_id: int,
+    db = Depends(get_read_db),
+    current_user = Depends(require_privilege("orders:read_all"))
+):
+    return await AsyncOrderSummaryService(db).get_summary(user_id)
+
+# Endpoint: List all orders (requires orders:read_all)
+@router.get("/", response_model=OrderPage)
+async def list_all_orders(
+    page: PageRequest = Depends(get_page_request),
+    filters: OrderFilter = Depends(get_order_filter),
+    db = Depends(get_read_db),
+    current_user = Depends(require_privilege("orders:read_all"))
+):
+    service = AsyncOrderService(db)
+    if settings.FAST_LIST_SERIALIZATION:
+        rows, next_cursor = await service.list_all_orders(page, filters, columns=ORDER_RESPONSE_COLUMNS)
+        return page_response(rows, next_cursor)
+    orders, next_cursor = await service.list_all_orders(page, filters)  # Returns one page of orders from the DB
+    return {"items": orders, "next_cursor": next_cursor}
+
+# Endpoint: Stream all orders as NDJSON or CSV for reconciliation (requires orders:read_all)
+@router.get("/export")
+async def export_orders(
+    format: ExportFormat = ExportFormat.ndjson,
+    filters: OrderFilter = Depends(get_order_filter),
+    current_user = Depends(require_privilege("orders:read_all"))
+):
+    header, encode = SERIALIZERS[format]
+    columns = [column.key for column in EXPORT_COLUMNS]
+    # Read from a replica like the other GET endpoints
+    session_factory, async_session_factory = read_session_factories(current_user.id)
 
-# Endpoint: Retrieve order details by ID (Admin or customer who owns the order)
+    # The body is produced after the request-scoped session is closed,
+    # so the stream owns its session for as long as the cursor is open.
+    def stream():
+        db = session_factory()
+        try:
+            yield header(columns)
+            for batch in OrderService(db).iter_order_batches_for_export(filters):
+                yield encode(batch, columns)
+        finally:
+            db.close()
+
+    async def stream_async():
+        async with async_session_factory() as db:
+            yield header(columns)
+            async for batch in AsyncOrderService(db).iter_order_batches_for_export(filters):
+                yield encode(batch, columns)
+
+    return StreamingResponse(
+        stream() if async_session_factory is None else stream_async(),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="orders.{format.value}"'},
+    )
+
+# Endpoint: Move many orders to a new status at once, e.g. mass cancellation (requires orders:write_all)
+# Runs chunked set-based UPDATE statements; each chunk commits on its own.
+@router.post("/bulk-status", response_model=OrderBulkStatusResponse)
+async def bulk_update_order_status(
+    bulk_data: OrderBulkStatusUpdate,
+    db = Depends(get_async_db),
+    current_user = Depends(require_privilege("orders:write_all"))
+):
+    service = AsyncOrderService(db)
+    filters = OrderFilter(**bulk_data.filter.model_dump()) if bulk_data.filter is not None else None
+    updated_ids = await service.bulk_update_status(bulk_data.target_status, order_ids=bulk_data.ids, filters=filters)
+    return {"target_status": bulk_data.target_status, "count": len(updated_ids), "updated_ids": updated_ids}
+
+# Endpoint: Retrieve order details by ID (orders:read_all, or the customer who owns the order)
+# With If-None-Match only the order's owner, updated_at and status are read; 304 when it did not change
 @router.get("/{order_id}", response_model=OrderResponse)
-def get_order(
+async def get_order(
     order_id: int,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    db = Depends(get_read_db),
+    current_user = Depends(get_current_user),
+    privileges: PrivilegeMatrix = Depends(get_privilege_matrix)
 ):
-    service = OrderService(db)
-    order = service.get_order(order_id)
+    service = AsyncOrderService(db)
+    read_all = privileges.has(current_user.role, "orders:read_all")
+    if "if-none-match" in request.headers:
+        version = await service.get_order_version(order_id)
+        # Missing or someone else's order: fall through to the full lookup for the 404/403
+        if version is not None and (read_all or current_user.id == version.user_id):
+            etag = make_etag("order", order_id, version.updated_at, version.status)
+            if etag_matches(request, etag):
+                return not_modified(etag)
+    order = await service.get_order(order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
-    # Allow access if the user is an admin or if they own the order
-    if current_user.role != "admin" and current_user.id != order.user_id:
+    # Allow access if the user's role may read all orders or if they own the order
+    if not read_all and current_user.id != order.user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
+    set_etag(response, make_etag("order", order.id, order.updated_at, order.status))
     return order
 
-# Endpoint: Update order details by ID (Admin or the owner)
+# Endpoint: Update order details by ID (orders:write_all, or the owner)
 @router.put("/{order_id}", response_model=OrderResponse)
-def update_order(
+async def update_order(
     order_id: int,
     order_data: OrderUpdate,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    db = Depends(get_async_db),
+    current_user = Depends(get_current_user),
+    privileges: PrivilegeMatrix = Depends(get_privilege_matrix)
 ):
-    service = OrderService(db)
-    order = service.get_order(order_id)
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    if current_user.role != "admin" and current_user.id != order.user_id:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    updated_order = service.update_order(order_id, order_data)
+    service = AsyncOrderService(db)
+    # Without orders:write_all the UPDATE only matches the customer's own order
+    owner_id = None if privileges.has(current_user.role, "orders:write_all") else current_user.id
+    updated_order = await service.update_order(order_id, order_data, owner_id=owner_id)
+    if not updated_order:
+        await raise_order_not_found_or_forbidden(service, order_id)
     return updated_order
 
-# Endpoint: Delete an order by ID (Admin or the owner)
+# Endpoint: Delete an order by ID (orders:write_all, or the owner)
 @router.delete("/{order_id}", status_code=status.HTTP_200_OK)
-def delete_order(
+async def delete_order(
     order_id: int,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    db = Depends(get_async_db),
+    current_user = Depends(get_current_user),
+    privileges: PrivilegeMatrix = Depends(get_privilege_matrix)
 ):
-    service = OrderService(db)
-    order = service.get_order(order_id)
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    if current_user.role != "admin" and current_user.id != order.user_id:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    success = service.delete_order(order_id)
+    service = AsyncOrderService(db)
+    owner_id = None if privileges.has(current_user.role, "orders:write_all") else current_user.id
+    success = await service.delete_order(order_id, owner_id=owner_id)
     if not success:
-        raise HTTPException(status_code=400, detail="Could not delete order")
-    return {"message": f"Order with ID: {order_id} has been deleted"}
\ No newline at end of file
+        await raise_order_not_found_or_forbidden(service, order_id)
+    return {"message": f"Order with ID: {order_id} has been deleted"}
+
+
+# A scoped mutation matched no row: 404 if the order does not exist, 403 if it belongs to someone else
+async def raise_order_not_found_or_forbidden(service: AsyncOrderService, order_id: int):
+    if await service.get_order_owner(order_id) is None:
+        raise HTTPException(status_code=404, detail="Order not found")
+    raise HTTPException(status_code=403, detail="Not authorized")
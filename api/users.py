@@ -1,69 +1,121 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from middleware.dependencies import get_db, get_current_user
-from services.user import UserService, UserCreate, UserUpdate
-from validators.users import UserResponse  # Pydantic response model for users
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from config.settings import settings
+from middleware.dependencies import get_async_db, get_read_db, get_current_user, get_page_request, get_ranked_page_request, get_privilege_matrix, require_privilege
+from services.etag import make_etag, etag_matches, set_etag, not_modified
+from services.pagination import PageRequest
+from services.role import PrivilegeMatrix
+from services.serialization import page_response
+from services.user import AsyncUserService, UserCreate, UserUpdate, USER_RESPONSE_COLUMNS
+from validators.users import UserResponse, UserPage  # Pydantic response models for users
 
 router = APIRouter(prefix="/users", tags=["users"])
 
-# Endpoint: Create a new user (Admin only)
+# Endpoint: Create a new user (requires users:create)
 @router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def create_user(
+async def create_user(
     user_data: UserCreate,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    db = Depends(get_async_db),
+    current_user = Depends(require_privilege("users:create"))
 ):
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Not authorized")
-    service = UserService(db)
-    user = service.create_user(user_data)
+    service = AsyncUserService(db)
+    user = await service.create_user(user_data)
     return user
 
-# Endpoint: Retrieve user details by ID (Admin, or the user themself)
+# Endpoint: Retrieve profile for the currently logged-in user
+# (the /me routes are declared before /{user_id} so "me" is not parsed as an id)
+@router.get("/me", response_model=UserResponse)
+async def get_my_profile(
+    request: Request,
+    response: Response,
+    current_user = Depends(get_current_user)
+):
+    # get_current_user already ensures token validity and returns the cached
+    # user snapshot, so this endpoint does not touch the database on a cache hit.
+    # The snapshot carries updated_at and the returned fields, so the ETag check needs no query either
+    # (the fields tell apart two updates within the same second, the resolution of updated_at on SQLite).
+    etag = make_etag("user", current_user.id, current_user.updated_at, current_user.username, current_user.email, current_user.role)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    return current_user
+
+# Endpoint: Update profile for the currently logged-in user
+@router.put("/me", response_model=UserResponse)
+async def update_my_profile(
+    update_data: UserUpdate,
+    db = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    service = AsyncUserService(db)
+    updated_user = await service.update_user(current_user.id, update_data)
+    if not updated_user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return updated_user
+
+# Endpoint: Search users by username or email (requires users:read_all)
+# Case-insensitive; exact matches first, then username prefixes, email prefixes and substrings.
+# Declared before /{user_id} as well.
+@router.get("/search", response_model=UserPage)
+async def search_users(
+    q: str = Query(..., min_length=1, max_length=settings.USER_SEARCH_QUERY_MAX_LENGTH, description="Part of a username or email"),
+    page: PageRequest = Depends(get_ranked_page_request),
+    db = Depends(get_read_db),
+    current_user = Depends(require_privilege("users:read_all"))
+):
+    if not q.strip():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Search query must not be blank")
+    rows, next_cursor = await AsyncUserService(db).search_users(q, page)
+    if settings.FAST_LIST_SERIALIZATION:
+        # Rows end with their rank, which is not part of the response
+        return page_response(rows, next_cursor, fields=len(USER_RESPONSE_COLUMNS))
+    return {"items": rows, "next_cursor": next_cursor}
+
+# Endpoint: Retrieve user details by ID (users:read_all, or the user themself)
 @router.get("/{user_id}", response_model=UserResponse)
-def get_user(
+async def get_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    db = Depends(get_read_db),
+    current_user = Depends(get_current_user),
+    privileges: PrivilegeMatrix = Depends(get_privilege_matrix)
 ):
-    service = UserService(db)
-    user = service.get_user(user_id)
+    service = AsyncUserService(db)
+    user = await service.get_user(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    # Admin can see any user; otherwise, users can only see their own details
-    if current_user.role != "admin" and current_user.id != user.id:
+    # users:read_all can see any user; otherwise, users can only see their own details
+    if not privileges.has(current_user.role, "users:read_all") and current_user.id != user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     return user
 
-# Endpoint: Update user details by ID (Admin, or the user themself)
+# Endpoint: Update user details by ID (users:write_all, or the user themself)
 @router.put("/{user_id}", response_model=UserResponse)
-def update_user(
+async def update_user(
     user_id: int,
     update_data: UserUpdate,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    db = Depends(get_async_db),
+    current_user = Depends(get_current_user),
+    privileges: PrivilegeMatrix = Depends(get_privilege_matrix)
 ):
-    service = UserService(db)
-    user = service.get_user(user_id)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    if current_user.role != "admin" and current_user.id != user.id:
+    service = AsyncUserService(db)
+    # Without users:write_all only the user's own row may be updated
+    actor_id = None if privileges.has(current_user.role, "users:write_all") else current_user.id
+    updated_user = await service.update_user(user_id, update_data, actor_id=actor_id)
+    if not updated_user:
+        # Nothing was updated: tell a missing user from one the caller may not edit
+        if not await service.user_exists(user_id):
+            raise HTTPException(status_code=404, detail="User not found")
         raise HTTPException(status_code=403, detail="Not authorized")
-    updated_user = service.update_user(user_id, update_data)
     return updated_user
 
-# Endpoint: Delete a user by ID (Admin only)
+# Endpoint: Delete a user by ID (requires users:delete)
 @router.delete("/{user_id}", status_code=status.HTTP_200_OK)
-def delete_user(
+async def delete_user(
         user_id: int,
-        db: Session = Depends(get_db),
-        current_user=Depends(get_current_user)
+        db = Depends(get_async_db),
+        current_user=Depends(require_privilege("users:delete"))
 ):
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Not authorized")
-
-    service = UserService(db)
-    success = service.delete_user(user_id)
+    service = AsyncUserService(db)
+    success = await service.delete_user(user_id)
 
     if not success:
         raise HTTPException(status_code=404, detail="User not found")
@@ -71,38 +123,17 @@ def delete_user(
     # Return a custom message with a 200 OK status
     return {"message": f"User with ID: {user_id} has been deleted"}
 
-# Endpoint: List all users (Admin only)
-@router.get("/", response_model=list[UserResponse])
-def list_users(
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+# Endpoint: List all users (requires users:read_all)
+@router.get("/", response_model=UserPage)
+async def list_users(
+    page: PageRequest = Depends(get_page_request),
+    db = Depends(get_read_db),
+    current_user = Depends(require_privilege("users:read_all"))
 ):
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Not authorized")
-    service = UserService(db)
-    # Implement a method in your service to list all users.
-    # For this example, we'll assume you add a method called list_users.
-    users = service.list_users()  # Make sure this method returns a list of User objects
-    return users
-
-# Endpoint: Retrieve profile for the currently logged-in user
-@router.get("/me", response_model=UserResponse)
-def get_my_profile(
-    current_user = Depends(get_current_user)
-):
-    # Since get_current_user already ensures token validity,
-    # simply return the current user’s info.
-    return current_user
-
-# Endpoint: Update profile for the currently logged-in user
-@router.put("/me", response_model=UserResponse)
-def update_my_profile(
-    update_data: UserUpdate,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
-):
-    service = UserService(db)
-    updated_user = service.update_user(current_user.id, update_data)
-    if not updated_user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return updated_user
\ No newline at end of file
+    service = AsyncUserService(db)
+    if settings.FAST_LIST_SERIALIZATION:
+        rows, next_cursor = await service.list_users(page, columns=USER_RESPONSE_COLUMNS)
+        return page_response(rows, next_cursor)
+    # Keyset pagination: only one page of users (plus one lookahead row) is loaded per request
+    users, next_cursor = await service.list_users(page)
+    return {"items": users, "next_cursor": next_cursor}
@@ -0,0 +1,112 @@
+"""Byte-identity check and per-row cost of the fast list serialization path.
+
+Boots the app in-process against a temporary SQLite database (or --database-url), loads orders
+with the synthetic data generator plus a few edge cases (tiny and huge amounts, non-ASCII
+names), then:
+
+1. walks every page of the order and user list endpoints with FAST_LIST_SERIALIZATION off and
+   on and fails unless the response bodies are byte-identical;
+2. times the serialization of one page of `--page-size` rows both ways (Pydantic validation +
+   stdlib JSON, as FastAPI does it, vs. column rows + orjson) and the full request both ways.
+
+    python -m benchmarks.list_serialization --orders 20000 --page-size 500
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from decimal import Decimal
+
+
+def best_of(fn, rounds: int = 5) -> float:
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Throwaway database (default: a temporary SQLite file)")
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--page-size", type=int, default=500)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/list_serialization.db"
+    os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+    os.environ["PAGE_SIZE_MAX"] = str(max(args.page_size, 500))
+    from fastapi.testclient import TestClient
+    from pydantic import TypeAdapter
+    from sqlalchemy import insert
+    from config.settings import OrderStatus, settings
+    from database.database import SessionLocal, engine
+    from database.models import Order, User
+    from benchmarks.generate_data import generate
+    from main import app
+    from services.order import OrderService, ORDER_RESPONSE_COLUMNS
+    from services.pagination import PageRequest
+    from services.serialization import page_response
+    from validators.orders import OrderPage
+
+    with TestClient(app) as client:
+        user_ids = generate(engine, users=max(args.orders // 20, 1), orders=args.orders, defer_indexes=False)
+        with engine.begin() as conn:
+            conn.execute(insert(User), [{"username": "Zoë   \"quoted\"", "email": "zoe@example.com", "hashed_password": "x", "role": "customer"}])
+            conn.execute(insert(Order), [
+                {"user_id": user_ids[0], "total_amount": Decimal(amount), "status": OrderStatus.pending}
+                for amount in ("0", "0.00001", "0.0001", "123.45", "99999999999999999", "1E+20")
+            ])
+        admin = {"Authorization": "Bearer " + client.post("/auth/", data={"username": "admin", "password": "AdminPass123"}).json()["access_token"]}
+
+        def walk(path: str) -> list[bytes]:
+            bodies, cursor = [], None
+            while True:
+                params = {"limit": args.page_size, **({"cursor": cursor} if cursor else {})}
+                response = client.get(path, params=params, headers=admin)
+                bodies.append(response.content)
+                cursor = response.json()["next_cursor"]
+                if cursor is None:
+                    return bodies
+
+        failures = 0
+        for path in ("/orders/", f"/orders/users/{user_ids[0]}", "/users/"):
+            settings.FAST_LIST_SERIALIZATION = False
+            standard = walk(path)
+            settings.FAST_LIST_SERIALIZATION = True
+            fast = walk(path)
+            identical = standard == fast
+            failures += not identical
+            print(f"{path:<22} {len(standard):>4} pages  {'byte-identical' if identical else 'DIFFERENT'}")
+
+        # Serialization alone, for one page of rows already loaded
+        page = PageRequest(limit=args.page_size)
+        with SessionLocal() as db:
+            orders, _ = OrderService(db).list_all_orders(page)
+            rows, _ = OrderService(db).list_all_orders(page, columns=ORDER_RESPONSE_COLUMNS)
+        adapter = TypeAdapter(OrderPage)
+
+        def standard_serialize():
+            content = adapter.dump_python(adapter.validate_python({"items": orders, "next_cursor": None}, from_attributes=True), mode="json")
+            json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+        standard_s = best_of(standard_serialize)
+        fast_s = best_of(lambda: page_response(rows, None))
+        print(f"\nserialization of {len(rows)} rows: standard {standard_s / len(rows) * 1e6:.2f} µs/row, "
+              f"fast {fast_s / len(rows) * 1e6:.2f} µs/row ({standard_s / fast_s:.1f}x)")
+
+        # Whole request (query + serialization + HTTP) for the same page
+        timings = {}
+        for fast_path in (False, True):
+            settings.FAST_LIST_SERIALIZATION = fast_path
+            timings[fast_path] = best_of(lambda: client.get("/orders/", params={"limit": args.page_size}, headers=admin))
+        print(f"GET /orders/?limit={args.page_size}: standard {timings[False] * 1000:.2f} ms, fast {timings[True] * 1000:.2f} ms")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
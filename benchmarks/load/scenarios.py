@@ -0,0 +1,64 @@
+import random
+from dataclasses import dataclass, field
+import httpx
+from benchmarks.load.seed import LOAD_PASSWORD
+
+
+@dataclass
+class LoadUser:
+    id: int
+    username: str
+    access_token: str
+    refresh_token: str
+
+
+    @property
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.access_token}"}
+
+
+@dataclass
+class ScenarioContext:
+    users: list[LoadUser]
+    admin: LoadUser
+    rng: random.Random = field(default_factory=lambda: random.Random(7))
+
+
+    def user(self) -> LoadUser:
+        return self.rng.choice(self.users)
+
+
+# Each scenario sends one request and returns the response; the runner times it and
+# counts any status >= 400 as an error.
+async def login(client: httpx.AsyncClient, ctx: ScenarioContext) -> httpx.Response:
+    return await client.post("/auth/", data={"username": ctx.user().username, "password": LOAD_PASSWORD})
+
+
+async def refresh(client: httpx.AsyncClient, ctx: ScenarioContext) -> httpx.Response:
+    return await client.post("/auth/refresh", json={"refresh_token": ctx.user().refresh_token})
+
+
+async def users_me(client: httpx.AsyncClient, ctx: ScenarioContext) -> httpx.Response:
+    return await client.get("/users/me", headers=ctx.user().headers)
+
+
+async def create_order(client: httpx.AsyncClient, ctx: ScenarioContext) -> httpx.Response:
+    return await client.post("/orders/", json={"total_amount": round(ctx.rng.uniform(5, 500), 2)}, headers=ctx.user().headers)
+
+
+async def orders_me(client: httpx.AsyncClient, ctx: ScenarioContext) -> httpx.Response:
+    return await client.get("/orders/me", headers=ctx.user().headers)
+
+
+async def admin_list(client: httpx.AsyncClient, ctx: ScenarioContext) -> httpx.Response:
+    return await client.get("/orders/", params={"limit": 50}, headers=ctx.admin.headers)
+
+
+SCENARIOS = {
+    "login": login,
+    "refresh": refresh,
+    "users_me": users_me,
+    "create_order": create_order,
+    "orders_me": orders_me,
+    "admin_list": admin_list,
+}
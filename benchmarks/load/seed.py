@@ -0,0 +1,27 @@
+from sqlalchemy import create_engine, select
+from benchmarks.generate_data import generate
+from database.models import User
+
+LOAD_PASSWORD = "LoadPass123"
+USERNAME_PREFIX = "load_user_"
+
+
+# Load users and their orders with the synthetic data generator. Every load user has LOAD_PASSWORD.
+# Seeding is skipped when the users are already there, so a database can be reused across runs.
+# Returns (id, username) of the load users.
+def seed(database_url: str, users: int, orders_per_user: int, seed: int = 42) -> list[tuple[int, str]]:
+    engine = create_engine(database_url)
+    load_users = select(User.id, User.username).where(User.username.like(USERNAME_PREFIX + "%")).order_by(User.id)
+    try:
+        with engine.connect() as conn:
+            existing = len(conn.execute(load_users).all())
+        missing = users - existing
+        if missing > 0:
+            generate(
+                engine, missing, missing * orders_per_user, seed=seed, password=LOAD_PASSWORD,
+                username_prefix=USERNAME_PREFIX, defer_indexes=False,
+            )
+        with engine.connect() as conn:
+            return [tuple(row) for row in conn.execute(load_users).all()[:users]]
+    finally:
+        engine.dispose()
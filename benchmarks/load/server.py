@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+import httpx
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+# The app under test, run by uvicorn in a child process so the load generator's own CPU use
+# does not compete with the event loop being measured.
+class AppServer:
+    def __init__(self, database_url: str, port: int, workers: int = 1, env: dict | None = None):
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.port = port
+        self.workers = workers
+        self.env = {**os.environ, "DATABASE_URL": database_url, **(env or {})}
+        self._process: subprocess.Popen | None = None
+
+
+    def start(self, timeout: float = 60) -> None:
+        command = [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1", "--port", str(self.port), "--workers", str(self.workers),
+            "--log-level", "warning", "--no-access-log",
+        ]
+        self._process = subprocess.Popen(command, cwd=REPO_ROOT, env=self.env)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError(f"Server exited during startup with code {self._process.returncode}")
+            try:
+                if httpx.get(self.base_url + "/", timeout=1).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f"Server did not answer on {self.base_url} within {timeout:.0f}s")
+
+
+    def stop(self) -> None:
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        self._process = None
+
+
+    def __enter__(self):
+        self.start()
+        return self
+
+
+    def __exit__(self, *exc):
+        self.stop()
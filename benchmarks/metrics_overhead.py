@@ -0,0 +1,63 @@
+"""Per-request cost of MetricsMiddleware.
+
+Drives a no-op ASGI app directly (no server, no HTTP parsing) with and without the middleware
+and reports the difference per request. Fails if it exceeds the budget (default 20 µs).
+
+    python -m benchmarks.metrics_overhead --requests 200000
+"""
+import argparse
+import asyncio
+import sys
+import time
+from types import SimpleNamespace
+from middleware.metrics import MetricsMiddleware
+
+ROUTE = SimpleNamespace(path="/orders/{order_id}")
+
+
+async def endpoint(scope, receive, send):
+    # What the router does on a match
+    scope["route"] = ROUTE
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+async def per_request_seconds(app, requests: int) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app({"type": "http", "method": "GET", "path": "/orders/1"}, receive, send)
+    return (time.perf_counter() - started) / requests
+
+
+async def measure(requests: int) -> tuple[float, float]:
+    wrapped = MetricsMiddleware(endpoint)
+    # Warm up, then take the best of a few rounds of each to filter scheduler noise
+    await per_request_seconds(wrapped, requests // 10)
+    bare = min([await per_request_seconds(endpoint, requests) for _ in range(3)])
+    instrumented = min([await per_request_seconds(wrapped, requests) for _ in range(3)])
+    return bare, instrumented
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100000)
+    parser.add_argument("--budget-us", type=float, default=20.0)
+    args = parser.parse_args()
+
+    bare, instrumented = asyncio.run(measure(args.requests))
+    overhead_us = (instrumented - bare) * 1e6
+    print(f"without middleware {bare * 1e6:.2f} µs/request, with {instrumented * 1e6:.2f} µs/request, "
+          f"overhead {overhead_us:.2f} µs (budget {args.budget_us:.0f} µs)")
+    sys.exit(1 if overhead_us > args.budget_us else 0)
+
+
+if __name__ == "__main__":
+    main()
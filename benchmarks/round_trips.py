@@ -0,0 +1,155 @@
+"""Per-endpoint database round trips, checked against a recorded baseline.
+
+Boots the app in-process against a fresh SQLite database (or the throwaway database given by
+--database-url), warms the caches, then sends one request per endpoint and counts the SQL
+statements and commits each request causes. The counts are compared with round_trips.json next
+to this file; an endpoint that needs more round trips than recorded fails the run.
+
+Baselines are kept per dialect: SQLite cannot return multi-row INSERT results in parameter order,
+so there /orders/batch inserts one row per statement.
+
+    python -m benchmarks.round_trips
+    python -m benchmarks.round_trips --update     # record the current counts as the baseline
+
+The JWT settings are read from the environment / .env as usual. A --database-url must be a
+throwaway database: the app creates its schema and seed data there.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+BASELINE = Path(__file__).with_name("round_trips.json")
+ADMIN = {"username": "admin", "password": "AdminPass123"}
+CUSTOMER = {"username": "rt_customer", "email": "rt_customer@example.com", "password": "CustomerPass123"}
+
+
+class RoundTripCounter:
+    def __init__(self):
+        self.statements = 0
+        self.commits = 0
+
+
+    def attach(self, engine) -> None:
+        from sqlalchemy import event
+        event.listen(engine, "before_cursor_execute", self._statement)
+        event.listen(engine, "commit", self._commit)
+
+
+    def reset(self) -> None:
+        self.statements = 0
+        self.commits = 0
+
+
+    def _statement(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements += 1
+
+
+    def _commit(self, conn):
+        self.commits += 1
+
+
+def run_scenarios(client, counter: RoundTripCounter) -> dict:
+    results = {}
+
+    def measure(name: str, method: str, path: str, **kwargs):
+        counter.reset()
+        response = client.request(method, path, **kwargs)
+        if response.status_code >= 400:
+            raise SystemExit(f"{name}: unexpected {response.status_code} {response.text}")
+        results[name] = {"statements": counter.statements, "commits": counter.commits}
+        return response
+
+    # Warm-up: log both users in and load their cached principals
+    admin_tokens = client.post("/auth/", data=ADMIN).json()
+    admin = {"Authorization": f"Bearer {admin_tokens['access_token']}"}
+    customer_id = client.post("/users/", json=CUSTOMER, headers=admin).json()["id"]
+    customer_tokens = client.post("/auth/", data={"username": CUSTOMER["username"], "password": CUSTOMER["password"]}).json()
+    customer = {"Authorization": f"Bearer {customer_tokens['access_token']}"}
+    client.get("/users/me", headers=admin)
+    client.get("/users/me", headers=customer)
+
+    measure("POST /auth/", "POST", "/auth/", data=ADMIN)
+    measure("POST /auth/refresh", "POST", "/auth/refresh", json={"refresh_token": admin_tokens["refresh_token"]})
+
+    extra = measure("POST /users/", "POST", "/users/", json={"username": "rt_extra", "email": "rt_extra@example.com", "password": "x"}, headers=admin).json()
+    profile = measure("GET /users/me", "GET", "/users/me", headers=customer)
+    measure("GET /users/me (304)", "GET", "/users/me", headers={**customer, "If-None-Match": profile.headers["etag"]})
+    measure("PUT /users/me", "PUT", "/users/me", json={"email": "rt_customer2@example.com"}, headers=customer)
+    measure("GET /users/{id}", "GET", f"/users/{customer_id}", headers=admin)
+    measure("PUT /users/{id}", "PUT", f"/users/{customer_id}", json={"email": CUSTOMER["email"]}, headers=admin)
+    measure("GET /users/", "GET", "/users/", headers=admin)
+    measure("GET /users/search", "GET", "/users/search", params={"q": "rt_"}, headers=admin)
+    measure("DELETE /users/{id}", "DELETE", f"/users/{extra['id']}", headers=admin)
+
+    order = measure("POST /orders/", "POST", "/orders/", json={"total_amount": 10}, headers=customer).json()
+    measure("POST /orders/batch", "POST", "/orders/batch", json={"items": [{"total_amount": n} for n in range(1, 11)]}, headers=customer)
+    my_orders = measure("GET /orders/me", "GET", "/orders/me", headers=customer)
+    measure("GET /orders/me (304)", "GET", "/orders/me", headers={**customer, "If-None-Match": my_orders.headers["etag"]})
+    measure("GET /orders/", "GET", "/orders/", headers=admin)
+    measure("GET /orders/users/{id}", "GET", f"/orders/users/{customer_id}", headers=admin)
+    measure("GET /orders/me/summary", "GET", "/orders/me/summary", headers=customer)
+    measure("GET /orders/users/{id}/summary", "GET", f"/orders/users/{customer_id}/summary", headers=admin)
+    single = measure("GET /orders/{id}", "GET", f"/orders/{order['id']}", headers=customer)
+    measure("GET /orders/{id} (304)", "GET", f"/orders/{order['id']}", headers={**customer, "If-None-Match": single.headers["etag"]})
+    measure("PUT /orders/{id}", "PUT", f"/orders/{order['id']}", json={"status": "completed"}, headers=customer)
+    measure("POST /orders/bulk-status", "POST", "/orders/bulk-status", json={"target_status": "cancelled", "filter": {"user_id": customer_id}}, headers=admin)
+    measure("GET /orders/export", "GET", "/orders/export", headers=admin)
+    measure("GET /analytics/orders", "GET", "/analytics/orders", params={"from": "2025-01-01T00:00:00", "to": "2026-01-01T00:00:00"}, headers=admin)
+    measure("DELETE /orders/{id}", "DELETE", f"/orders/{order['id']}", headers=customer)
+    return results
+
+
+def compare(results: dict, baseline: dict) -> int:
+    failures = 0
+    for name, counts in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            status = "new"
+        elif any(counts[key] > expected[key] for key in counts):
+            status = "REGRESSED"
+            failures += 1
+        elif counts != expected:
+            status = "improved (run with --update)"
+        else:
+            status = "ok"
+        recorded = f"{expected['statements']:>3} / {expected['commits']}" if expected else "  - / -"
+        print(f"{name:<32} statements/commits {counts['statements']:>3} / {counts['commits']}   baseline {recorded}   {status}")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Throwaway database (default: a temporary SQLite file)")
+    parser.add_argument("--update", action="store_true", help="Write the measured counts to the baseline file")
+    args = parser.parse_args()
+
+    # The app reads its settings at import time
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/round_trips.db"
+    os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+    from fastapi.testclient import TestClient
+    from database.database import engine, async_engine
+    from main import app
+
+    counter = RoundTripCounter()
+    counter.attach(engine)
+    if async_engine is not None:
+        counter.attach(async_engine.sync_engine)
+
+    with TestClient(app) as client:
+        results = run_scenarios(client, counter)
+
+    baselines = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    dialect = engine.dialect.name
+    if args.update:
+        baselines[dialect] = results
+        BASELINE.write_text(json.dumps(baselines, indent=2) + "\n")
+        print(f"{dialect} baseline written to {BASELINE}")
+        return
+    sys.exit(1 if compare(results, baselines.get(dialect, {})) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from sqlalchemy import text
+
+
+# Bounded in-process cache with LRU eviction and a per-entry absolute expiry (wall-clock seconds).
+# Thread-safe: sync routes and dependencies run on the threadpool.
+class TTLCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+
+    def set(self, key, value, expires_at: float) -> None:
+        if self.maxsize <= 0 or expires_at <= time.time():
+            return
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+    def pop(self, key) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+logger = logging.getLogger("cache")
+
+
+# Fan-out of cache invalidations. Subscribers register a callback per topic; publish() hands the
+# message to an optional backend that reaches the other worker processes, which dispatch() it
+# to their own subscribers. Without a backend, invalidations stay local to the process.
+# Publishing with a session sends the message on that session's transaction, when it commits.
+class InvalidationChannel:
+    def __init__(self):
+        self._subscribers: dict[str, list] = {}
+        self.backend = None
+
+
+    def subscribe(self, topic: str, callback) -> None:
+        self._subscribers.setdefault(topic, []).append(callback)
+
+
+    def publish(self, topic: str, key, db=None) -> None:
+        if self.backend is not None:
+            self.backend.publish(topic, str(key), db)
+
+
+    def dispatch(self, topic: str, key: str) -> None:
+        for callback in self._subscribers.get(topic, []):
+            callback(key)
+
+
+# Cross-process backend on PostgreSQL LISTEN/NOTIFY (psycopg2).
+# A daemon thread holds one dedicated connection, LISTENs on `channel` and dispatches notifications.
+# Payloads carry the id of the publishing process, whose listener skips them: the publisher has
+# already updated its own caches (e.g. written the new principal through).
+class PgNotifyBackend:
+    def __init__(self, engine, channel: str, target: InvalidationChannel):
+        self.engine = engine
+        self.channel = channel
+        self.target = target
+        self.origin = uuid.uuid4().hex
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+
+    # With `db`, the NOTIFY joins the session's transaction: PostgreSQL delivers it on commit (and drops
+    # it on rollback), so it needs no connection of its own and cannot fail after the write committed.
+    # Without one it goes out on its own connection, and a failure is logged rather than raised.
+    def publish(self, topic: str, key: str, db=None) -> None:
+        notify = text("SELECT pg_notify(:channel, :payload)")
+        params = {"channel": self.channel, "payload": f"{self.origin}:{topic}:{key}"}
+        if db is not None:
+            db.execute(notify, params)
+            return
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(notify, params)
+                conn.commit()
+        except Exception:
+            logger.exception("Could not publish %s:%s on %s", topic, key, self.channel)
+
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._listen, name="cache-invalidation", daemon=True)
+        self._thread.start()
+
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+    def _listen(self) -> None:
+        import select
+        conn = self.engine.raw_connection()
+        try:
+            dbapi_conn = conn.driver_connection
+            dbapi_conn.autocommit = True
+            with dbapi_conn.cursor() as cursor:
+                cursor.execute(f'LISTEN "{self.channel}"')
+            while not self._stop.is_set():
+                if select.select([dbapi_conn], [], [], 1.0) == ([], [], []):
+                    continue
+                dbapi_conn.poll()
+                while dbapi_conn.notifies:
+                    self.receive(dbapi_conn.notifies.pop(0).payload)
+        finally:
+            conn.invalidate()
+
+
+    # A notification from another process; this process's own were handled when it published them
+    def receive(self, payload: str) -> None:
+        origin, topic, key = payload.split(":", 2)
+        if origin != self.origin:
+            self.target.dispatch(topic, key)
+
+
+invalidation_channel = InvalidationChannel()
@@ -8,6 +8,12 @@ class OrderStatus(str, Enum):
     completed = 'completed'
 
 
+# Bucket sizes of the order rollups (GET /analytics/orders)
+class RollupGranularity(str, Enum):
+    hour = 'hour'
+    day = 'day'
+
+
 class Settings(BaseSettings):
     DATABASE_URL: str
     JWT_SECRET_KEY: str
@@ -16,6 +22,92 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int
     REFRESH_TOKEN_EXPIRE_MINUTES: int
 
+    # Database access mode: False runs services on the threadpool with the blocking driver,
+    # True runs them on an AsyncEngine (asyncpg / aiosqlite). Both serve the same async routes.
+    DB_ASYNC: bool = False
+    # Defaults to DATABASE_URL with the async driver swapped in
+    ASYNC_DATABASE_URL: str | None = None
+
+    # Read replicas for the GET endpoints: comma-separated URLs (empty = all traffic on the primary).
+    # A replica that fails its health check or lags more than REPLICA_MAX_LAG_SECONDS is skipped.
+    DATABASE_REPLICA_URLS: str = ""
+    REPLICA_MAX_LAG_SECONDS: float = 5
+    REPLICA_CHECK_INTERVAL_SECONDS: float = 5
+    # After a user's request commits on the primary, that user's reads stay on the primary this long
+    READ_YOUR_WRITES_SECONDS: float = 10
+
+    # SQLAlchemy statement echo (every statement to the log); for local debugging only
+    DB_ECHO: bool = False
+    # Statements slower than this go to the "sql.slow" log; a sampled fraction of those records carries
+    # the bind parameters (they may hold personal data)
+    DB_SLOW_QUERY_MS: float = 200
+    DB_SLOW_QUERY_PARAMS_SAMPLE_RATE: float = 0.1
+    # Report per-request statement count and DB time in a Server-Timing response header
+    DB_SERVER_TIMING: bool = True
+
+    # Prometheus metrics: request middleware and the GET /metrics endpoint
+    METRICS_ENABLED: bool = True
+
+    # bcrypt process pool: worker processes (0 = hash inline on the calling thread)
+    # and the number of hash/verify calls allowed in flight before answering 503
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    # Token-bucket rate limits on the /auth endpoints, checked before any database or bcrypt work:
+    # per client IP (login and refresh) and per username (login). RATE is tokens per second, BURST the
+    # bucket size; an empty bucket answers 429 with Retry-After.
+    AUTH_RATE_LIMIT_ENABLED: bool = True
+    AUTH_IP_RATE: float = 1.0
+    AUTH_IP_BURST: int = 30
+    AUTH_USERNAME_RATE: float = 0.2
+    AUTH_USERNAME_BURST: int = 10
+    # Buckets kept per worker (least recently used dropped beyond this)
+    AUTH_RATE_LIMIT_KEYS: int = 100000
+    # Keep the buckets in the database (PostgreSQL) so all workers share them, instead of per worker
+    AUTH_RATE_LIMIT_SHARED: bool = False
+
+    # Verified access/refresh token claims cached in-process until each token expires
+    TOKEN_CACHE_SIZE: int = 10000
+
+    # Authenticated user snapshots (id, username, email, role) cached per process
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    # PostgreSQL NOTIFY channel used to broadcast cache invalidations to other workers (off when unset)
+    CACHE_INVALIDATION_CHANNEL: str | None = None
+
+    # Maximum number of orders accepted by POST /orders/batch
+    ORDER_BATCH_MAX_ITEMS: int = 1000
+    # Bulk status transitions: ids accepted per request and rows changed per UPDATE statement
+    ORDER_BULK_MAX_IDS: int = 100000
+    ORDER_BULK_CHUNK_SIZE: int = 5000
+
+    # Order rollups: rows per bucket that order changes are spread over by user id, so concurrent orders
+    # of the current hour do not all wait on one row lock (reads add the rows up)
+    ORDER_ROLLUP_SHARDS: int = 8
+    # Most buckets returned by GET /analytics/orders (a year of hourly buckets is 8760)
+    ANALYTICS_MAX_BUCKETS: int = 10000
+
+    # Monthly partitions of orders (PostgreSQL, once migrated): months created ahead of the current one, on
+    # startup and by `python manage.py create-order-partitions` (0 skips the startup check)
+    ORDER_PARTITION_MONTHS_AHEAD: int = 3
+    # `python manage.py archive-order-partitions` detaches months older than this without pending orders
+    ORDER_ARCHIVE_AFTER_MONTHS: int = 24
+
+    # Keyset pagination for list endpoints
+    PAGE_SIZE_DEFAULT: int = 50
+    PAGE_SIZE_MAX: int = 500
+    # List endpoints select only the response columns and encode them directly (orjson when installed),
+    # skipping per-row Pydantic validation. The JSON is byte-identical to the default path.
+    FAST_LIST_SERIALIZATION: bool = False
+
+    # Longest ?q= accepted by GET /users/search
+    USER_SEARCH_QUERY_MAX_LENGTH: int = 255
+
+    # Startup: skip create_all when the database is at the Alembic head revision (one query instead of
+    # reflecting every table). Databases without Alembic history, or behind it, still get create_all.
+    STARTUP_SCHEMA_CHECK: bool = True
+    # Seed the default roles, privileges and admin user on startup, under an advisory lock so workers take turns.
+    # Turn off to seed once per deploy with `python manage.py seed` instead.
+    STARTUP_SEED: bool = True
 
     class Config:
         env_file = ".env"
@@ -1,11 +1,58 @@
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
 from config.settings import settings
+from database.instrumentation import instrument
+from metrics import track_engine_pool
 
 DATABASE_URL = settings.DATABASE_URL
 
 # Create the database engine (establish connection with the database)
-engine = create_engine(DATABASE_URL, echo=True, future=True)
+engine = create_engine(DATABASE_URL, echo=settings.DB_ECHO, future=True)
+instrument(engine)
+track_engine_pool(engine, "sync")
 
-# Create a session factory (create local sessions for CRUD operations)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
\ No newline at end of file
+# Create a session factory (create local sessions for CRUD operations).
+# Objects stay loaded after commit: rows returned by INSERT/UPDATE ... RETURNING are
+# serialized after the commit and must not be reloaded one SELECT at a time.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# Sync drivers mapped to their asyncio counterparts
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+# Async engine and session factory, only created when the async path is enabled
+async_engine = None
+AsyncSessionLocal = None
+if settings.DB_ASYNC:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    async_engine = create_async_engine(settings.ASYNC_DATABASE_URL or to_async_url(DATABASE_URL), echo=settings.DB_ECHO)
+    instrument(async_engine.sync_engine)
+    track_engine_pool(async_engine.sync_engine, "async")
+    # Objects must stay readable after commit: an expired attribute cannot be lazy-loaded outside the greenlet
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+# Sync Session exposed through AsyncSession's run_sync interface.
+# Used when DB_ASYNC is off so async routes and services run the blocking driver on the threadpool.
+class ThreadedSession:
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+
+    async def close(self) -> None:
+        await run_in_threadpool(self.sync_session.close)
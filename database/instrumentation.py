@@ -0,0 +1,98 @@
+import json
+import logging
+import random
+import re
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from sqlalchemy import event
+from config.settings import settings
+
+logger = logging.getLogger("sql")
+slow_query_logger = logging.getLogger("sql.slow")
+
+MAX_PARAM_LENGTH = 100
+MAX_PARAM_SETS = 3
+
+
+# Statements run on behalf of one request
+@dataclass
+class QueryStats:
+    method: str = ""
+    path: str = ""
+    statements: int = 0
+    total_ms: float = 0.0
+    slowest_ms: float = 0.0
+    slowest_statement: str | None = None
+
+
+    def record(self, statement: str, elapsed_ms: float) -> None:
+        self.statements += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms > self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest_statement = statement
+
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.total_ms:.2f};desc="{self.statements} queries", db-slowest;dur={self.slowest_ms:.2f}'
+
+
+# Set by QueryStatsMiddleware for the duration of a request. Threadpool calls and AsyncSession
+# greenlets run in a copy of the request's context, so they record into the same object.
+current_query_stats: ContextVar[QueryStats | None] = ContextVar("current_query_stats", default=None)
+
+
+# Bind parameters shortened for logging: long values are cut and executemany keeps a few sets
+def _loggable_params(parameters, executemany: bool):
+    def shorten(value):
+        text = repr(value)
+        return text if len(text) <= MAX_PARAM_LENGTH else text[:MAX_PARAM_LENGTH] + "..."
+
+    def one(params):
+        if isinstance(params, dict):
+            return {key: shorten(value) for key, value in params.items()}
+        return [shorten(value) for value in params]
+
+    if executemany:
+        return [one(params) for params in list(parameters)[:MAX_PARAM_SETS]]
+    return one(parameters)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_start"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop("query_start", None)
+    if started is None:
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed_ms)
+    if elapsed_ms >= settings.DB_SLOW_QUERY_MS:
+        record = {"duration_ms": round(elapsed_ms, 2), "statement": " ".join(statement.split())}
+        if stats is not None:
+            record.update(method=stats.method, path=stats.path)
+        if random.random() < settings.DB_SLOW_QUERY_PARAMS_SAMPLE_RATE:
+            record["params"] = _loggable_params(parameters, executemany)
+        slow_query_logger.warning(json.dumps(record, default=str))
+
+
+# Time every statement on `engine` (the sync engine of an AsyncEngine for the async path)
+def instrument(engine) -> None:
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# Test helper: fail if the request behind `response` ran more statements than `budget` (with `exact`, any
+# other number). Reads the Server-Timing header, so it works with TestClient and with a live server.
+def assert_query_budget(response, budget: int, exact: bool = False) -> None:
+    match = re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', response.headers.get("server-timing", ""))
+    if match is None:
+        raise AssertionError("Response has no db Server-Timing entry (is DB_SERVER_TIMING enabled?)")
+    statements = int(match.group(1))
+    if statements > budget or (exact and statements != budget):
+        expected = "exactly" if exact else "budget is"
+        raise AssertionError(f"{response.request.method} {response.request.url.path} ran {statements} statements, {expected} {budget}")
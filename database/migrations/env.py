@@ -1,7 +1,7 @@
 from logging.config import fileConfig
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
-from database.models import orders, users, roles, privileges, role_privileges
+from database.models import orders, users, roles, privileges, role_privileges, rate_limits, order_summaries, order_rollups, archived_order_totals
 from alembic import context
 from config.settings import settings
 from database.models.base import Base
@@ -0,0 +1,51 @@
+"""Added user order summary table
+
+Revision ID: 0bfc1a61b7b9
+Revises: 6d92e9c95ea8
+Create Date: 2026-10-18 18:11:52.604218+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0bfc1a61b7b9'
+down_revision: Union[str, None] = '6d92e9c95ea8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+STATUSES = ('pending', 'cancelled', 'completed')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('user_order_summary',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('pending_count', sa.Integer(), nullable=False),
+    sa.Column('pending_amount', sa.DECIMAL(), nullable=False),
+    sa.Column('cancelled_count', sa.Integer(), nullable=False),
+    sa.Column('cancelled_amount', sa.DECIMAL(), nullable=False),
+    sa.Column('completed_count', sa.Integer(), nullable=False),
+    sa.Column('completed_amount', sa.DECIMAL(), nullable=False),
+    sa.Column('last_order_at', sa.TIMESTAMP(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    # Backfill from the existing orders; from here on OrderService keeps the rows up to date
+    totals = ', '.join(
+        f"sum(CASE WHEN status = '{status}' THEN 1 ELSE 0 END), sum(CASE WHEN status = '{status}' THEN total_amount ELSE 0 END)"
+        for status in STATUSES
+    )
+    columns = ', '.join(f'{status}_count, {status}_amount' for status in STATUSES)
+    op.execute(
+        f'INSERT INTO user_order_summary (user_id, {columns}, last_order_at) '
+        f'SELECT user_id, {totals}, max(order_date) FROM orders GROUP BY user_id'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_order_summary')
@@ -0,0 +1,32 @@
+"""Added covering indexes for order ETags
+
+Revision ID: 28720faf8823
+Revises: 7ad16d5dadfc
+Create Date: 2026-10-18 14:21:05.318274+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '28720faf8823'
+down_revision: Union[str, None] = '7ad16d5dadfc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # (user_id, id, updated_at) still serves keyset pagination and replaces (user_id, id)
+    op.create_index('ix_orders_user_id_id_updated_at', 'orders', ['user_id', 'id', 'updated_at'], unique=False)
+    op.drop_index('ix_orders_user_id_id', table_name='orders')
+    op.create_index('ix_orders_id_user_id_updated_at', 'orders', ['id', 'user_id', 'updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_orders_id_user_id_updated_at', table_name='orders')
+    op.create_index('ix_orders_user_id_id', 'orders', ['user_id', 'id'], unique=False)
+    op.drop_index('ix_orders_user_id_id_updated_at', table_name='orders')
@@ -0,0 +1,58 @@
+"""Added order rollups table
+
+Revision ID: 389cc7a8ddf1
+Revises: 0bfc1a61b7b9
+Create Date: 2026-10-18 19:26:08.331457+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '389cc7a8ddf1'
+down_revision: Union[str, None] = '0bfc1a61b7b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+STATUSES = ('pending', 'cancelled', 'completed')
+# Bucket start per granularity; on SQLite in the text format SQLAlchemy writes timestamps in
+BUCKETS = {
+    'postgresql': {'hour': "date_trunc('hour', order_date)", 'day': "date_trunc('day', order_date)"},
+    'sqlite': {'hour': "strftime('%Y-%m-%d %H:00:00.000000', order_date)", 'day': "strftime('%Y-%m-%d 00:00:00.000000', order_date)"},
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('order_rollups',
+    sa.Column('granularity', sa.String(length=8), nullable=False),
+    sa.Column('bucket_start', sa.TIMESTAMP(), nullable=False),
+    sa.Column('shard', sa.Integer(), nullable=False),
+    sa.Column('pending_count', sa.Integer(), nullable=False),
+    sa.Column('pending_amount', sa.DECIMAL(), nullable=False),
+    sa.Column('cancelled_count', sa.Integer(), nullable=False),
+    sa.Column('cancelled_amount', sa.DECIMAL(), nullable=False),
+    sa.Column('completed_count', sa.Integer(), nullable=False),
+    sa.Column('completed_amount', sa.DECIMAL(), nullable=False),
+    sa.PrimaryKeyConstraint('granularity', 'bucket_start', 'shard')
+    )
+    # Backfill from the existing orders, all in shard 0; from here on OrderService keeps the buckets up to date
+    totals = ', '.join(
+        f"sum(CASE WHEN status = '{status}' THEN 1 ELSE 0 END), sum(CASE WHEN status = '{status}' THEN total_amount ELSE 0 END)"
+        for status in STATUSES
+    )
+    columns = ', '.join(f'{status}_count, {status}_amount' for status in STATUSES)
+    buckets = BUCKETS['postgresql' if op.get_bind().dialect.name == 'postgresql' else 'sqlite']
+    for granularity, bucket in buckets.items():
+        op.execute(
+            f'INSERT INTO order_rollups (granularity, bucket_start, shard, {columns}) '
+            f"SELECT '{granularity}', {bucket}, 0, {totals} FROM orders WHERE order_date IS NOT NULL GROUP BY {bucket}"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('order_rollups')
@@ -0,0 +1,40 @@
+"""Added rate limit buckets table
+
+Revision ID: 4b3842e0d7bb
+Revises: 28720faf8823
+Create Date: 2026-10-18 15:02:44.918305+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b3842e0d7bb'
+down_revision: Union[str, None] = '28720faf8823'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('rate_limit_buckets',
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('tokens', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.Float(), nullable=False),
+    sa.Column('full_at', sa.Float(), nullable=False),
+    sa.Column('allowed', sa.Boolean(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index('ix_rate_limit_buckets_full_at', 'rate_limit_buckets', ['full_at'], unique=False)
+    # Buckets are disposable: skip the WAL
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('ALTER TABLE rate_limit_buckets SET UNLOGGED')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_rate_limit_buckets_full_at', table_name='rate_limit_buckets')
+    op.drop_table('rate_limit_buckets')
@@ -0,0 +1,109 @@
+"""Partitioned orders by month of order_date
+
+Revision ID: 5b1d22cd6ea6
+Revises: 389cc7a8ddf1
+Create Date: 2026-10-18 21:04:37.190264+00:00
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b1d22cd6ea6'
+down_revision: Union[str, None] = '389cc7a8ddf1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = 'id, user_id, order_date, total_amount, status, created_at, updated_at'
+# Month partitions created ahead of the current month (the app keeps creating them, see ORDER_PARTITION_MONTHS_AHEAD)
+MONTHS_AHEAD = 3
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def orders_columns() -> list:
+    return [
+        sa.Column('id', sa.Integer(), server_default=sa.text("nextval('orders_id_seq'::regclass)"), autoincrement=False, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('order_date', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('total_amount', sa.DECIMAL(), nullable=False),
+        sa.Column('status', postgresql.ENUM(name='order_status', create_type=False), nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=True),
+    ]
+
+
+# Constraints and indexes of orders, built once the rows are in
+def create_constraints(date_column: str, **pending_where) -> None:
+    op.create_foreign_key('orders_user_id_fkey', 'orders', 'users', ['user_id'], ['id'])
+    op.create_index('ix_orders_user_id_id_updated_at', 'orders', ['user_id', 'id', 'updated_at'], unique=False)
+    op.create_index('ix_orders_id_user_id_updated_at', 'orders', ['id', 'user_id', 'updated_at'], unique=False)
+    op.create_index(f'ix_orders_user_id_{date_column}_id', 'orders', ['user_id', date_column, 'id'], unique=False)
+    op.create_index(f'ix_orders_pending_{date_column}_id', 'orders', [date_column, 'id'], unique=False, **pending_where)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Order filters are on order_date now, the partition key
+    if op.get_bind().dialect.name != 'postgresql':
+        op.drop_index('ix_orders_pending_created_at_id', table_name='orders')
+        op.drop_index('ix_orders_user_id_created_at_id', table_name='orders')
+        op.create_index('ix_orders_user_id_order_date_id', 'orders', ['user_id', 'order_date', 'id'], unique=False)
+        op.create_index('ix_orders_pending_order_date_id', 'orders', ['order_date', 'id'], unique=False, sqlite_where=sa.text("status = 'pending'"))
+        return
+
+    # PostgreSQL: rebuild orders as a table partitioned by month of order_date, which every row needs then,
+    # with one partition per month from the oldest order to MONTHS_AHEAD months ahead and a default one.
+    # The primary key of a partitioned table includes the partition key: (id, order_date); ids still come
+    # from orders_id_seq. Constraints and indexes are built after the copy, once the old table is dropped.
+    op.execute('UPDATE orders SET order_date = coalesce(created_at, now()) WHERE order_date IS NULL')
+    op.rename_table('orders', 'orders_unpartitioned')
+    op.create_table('orders', *orders_columns(), postgresql_partition_by='RANGE (order_date)')
+
+    bind = op.get_bind()
+    current = bind.scalar(sa.text("SELECT date_trunc('month', localtimestamp)::timestamp"))
+    oldest = bind.scalar(sa.text("SELECT date_trunc('month', min(order_date)) FROM orders_unpartitioned")) or current
+    month = min(oldest, current)
+    while month <= add_months(current, MONTHS_AHEAD):
+        end = add_months(month, 1)
+        op.execute(f"CREATE TABLE orders_p{month:%Y_%m} PARTITION OF orders FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')")
+        month = end
+    op.execute('CREATE TABLE orders_default PARTITION OF orders DEFAULT')
+
+    op.execute(f'INSERT INTO orders ({COLUMNS}) SELECT {COLUMNS} FROM orders_unpartitioned')
+    op.execute('ALTER SEQUENCE orders_id_seq OWNED BY orders.id')
+    op.drop_table('orders_unpartitioned')
+    op.create_primary_key('orders_pkey', 'orders', ['id', 'order_date'])
+    create_constraints('order_date', postgresql_where=sa.text("status = 'pending'"))
+    op.execute('ANALYZE orders')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        op.drop_index('ix_orders_pending_order_date_id', table_name='orders')
+        op.drop_index('ix_orders_user_id_order_date_id', table_name='orders')
+        op.create_index('ix_orders_user_id_created_at_id', 'orders', ['user_id', 'created_at', 'id'], unique=False)
+        op.create_index('ix_orders_pending_created_at_id', 'orders', ['created_at', 'id'], unique=False, sqlite_where=sa.text("status = 'pending'"))
+        return
+
+    # Back to a single table with the orders of the attached partitions; archived ones (orders_archived_p*)
+    # are left as they are
+    op.rename_table('orders', 'orders_partitioned')
+    columns = orders_columns()
+    columns[2] = sa.Column('order_date', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=True)
+    op.create_table('orders', *columns)
+    op.execute(f'INSERT INTO orders ({COLUMNS}) SELECT {COLUMNS} FROM orders_partitioned')
+    op.execute('ALTER SEQUENCE orders_id_seq OWNED BY orders.id')
+    op.drop_table('orders_partitioned')
+    op.create_primary_key('orders_pkey', 'orders', ['id'])
+    create_constraints('created_at', postgresql_where=sa.text("status = 'pending'"))
+    op.execute('ANALYZE orders')
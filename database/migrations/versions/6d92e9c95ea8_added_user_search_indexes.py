@@ -0,0 +1,49 @@
+"""Added user search indexes
+
+Revision ID: 6d92e9c95ea8
+Revises: 4b3842e0d7bb
+Create Date: 2026-10-18 16:02:37.914406+00:00
+
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6d92e9c95ea8'
+down_revision: Union[str, None] = '4b3842e0d7bb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    postgresql = bind.dialect.name == 'postgresql'
+    # Equality and prefix search; text_pattern_ops serves LIKE 'term%' under any collation
+    pattern_ops = ' text_pattern_ops' if postgresql else ''
+    op.create_index('ix_users_username_lower_pattern', 'users', [sa.text(f'lower(username){pattern_ops}')], unique=False)
+    op.create_index('ix_users_email_lower_pattern', 'users', [sa.text(f'lower(email){pattern_ops}')], unique=False)
+    if not postgresql:
+        return
+    # Substring search (LIKE '%term%') needs trigram indexes, from the pg_trgm contrib extension
+    if bind.scalar(sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")) is None:
+        logger.warning("pg_trgm is not available: substring user search runs without an index")
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('ix_users_username_lower_trgm', 'users', [sa.text('lower(username) gin_trgm_ops')], unique=False, postgresql_using='gin')
+    op.create_index('ix_users_email_lower_trgm', 'users', [sa.text('lower(email) gin_trgm_ops')], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # The pg_trgm extension is left installed: other objects may depend on it
+    op.drop_index('ix_users_email_lower_trgm', table_name='users', if_exists=True)
+    op.drop_index('ix_users_username_lower_trgm', table_name='users', if_exists=True)
+    op.drop_index('ix_users_email_lower_pattern', table_name='users')
+    op.drop_index('ix_users_username_lower_pattern', table_name='users')
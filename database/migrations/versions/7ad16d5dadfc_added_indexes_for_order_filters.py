@@ -0,0 +1,33 @@
+"""Added indexes for order filters
+
+Revision ID: 7ad16d5dadfc
+Revises: f82184675bf7
+Create Date: 2026-10-18 10:02:17.550912+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7ad16d5dadfc'
+down_revision: Union[str, None] = 'f82184675bf7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_orders_user_id_created_at_id', 'orders', ['user_id', 'created_at', 'id'], unique=False)
+    op.create_index(
+        'ix_orders_pending_created_at_id', 'orders', ['created_at', 'id'], unique=False,
+        postgresql_where=sa.text("status = 'pending'"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_orders_pending_created_at_id', table_name='orders')
+    op.drop_index('ix_orders_user_id_created_at_id', table_name='orders')
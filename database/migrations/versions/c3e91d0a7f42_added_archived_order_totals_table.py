@@ -0,0 +1,42 @@
+"""Added archived order totals table
+
+Revision ID: c3e91d0a7f42
+Revises: 5b1d22cd6ea6
+Create Date: 2026-10-18 23:40:12.518734+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e91d0a7f42'
+down_revision: Union[str, None] = '5b1d22cd6ea6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Months archived before this revision were taken out of user_order_summary and order_rollups;
+    # they have no rows here, and stay out of both
+    op.create_table('archived_order_totals',
+    sa.Column('month', sa.TIMESTAMP(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('pending_count', sa.Integer(), nullable=False),
+    sa.Column('pending_amount', sa.DECIMAL(), nullable=False),
+    sa.Column('cancelled_count', sa.Integer(), nullable=False),
+    sa.Column('cancelled_amount', sa.DECIMAL(), nullable=False),
+    sa.Column('completed_count', sa.Integer(), nullable=False),
+    sa.Column('completed_amount', sa.DECIMAL(), nullable=False),
+    sa.Column('last_order_at', sa.TIMESTAMP(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('month', 'user_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('archived_order_totals')
@@ -0,0 +1,34 @@
+"""Added status to order ETag indexes
+
+Revision ID: e4b7a2c19d05
+Revises: c3e91d0a7f42
+Create Date: 2026-10-19 09:12:47.205318+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b7a2c19d05'
+down_revision: Union[str, None] = 'c3e91d0a7f42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Order ETags include status, so the If-None-Match checks stay index-only
+    op.create_index('ix_orders_user_id_id_updated_at_status', 'orders', ['user_id', 'id', 'updated_at', 'status'], unique=False)
+    op.drop_index('ix_orders_user_id_id_updated_at', table_name='orders')
+    op.create_index('ix_orders_id_user_id_updated_at_status', 'orders', ['id', 'user_id', 'updated_at', 'status'], unique=False)
+    op.drop_index('ix_orders_id_user_id_updated_at', table_name='orders')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_orders_id_user_id_updated_at', 'orders', ['id', 'user_id', 'updated_at'], unique=False)
+    op.drop_index('ix_orders_id_user_id_updated_at_status', table_name='orders')
+    op.create_index('ix_orders_user_id_id_updated_at', 'orders', ['user_id', 'id', 'updated_at'], unique=False)
+    op.drop_index('ix_orders_user_id_id_updated_at_status', table_name='orders')
@@ -0,0 +1,27 @@
+"""Added index for paginating orders by user
+
+Revision ID: f82184675bf7
+Revises: 45bbddb61541
+Create Date: 2026-10-18 09:12:41.318274+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f82184675bf7'
+down_revision: Union[str, None] = '45bbddb61541'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_orders_user_id_id', 'orders', ['user_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_orders_user_id_id', table_name='orders')
@@ -2,4 +2,8 @@ from .users import User
 from .orders import Order
 from .roles import Role
 from .privileges import Privilege
-from .role_privileges import RolePrivilege
\ No newline at end of file
+from .role_privileges import RolePrivilege
+from .rate_limits import RateLimitBucket
+from .order_summaries import UserOrderSummary
+from .order_rollups import OrderRollup
+from .archived_order_totals import ArchivedOrderTotals
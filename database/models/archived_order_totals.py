@@ -0,0 +1,22 @@
+from sqlalchemy import Column, DECIMAL, ForeignKey, Integer, TIMESTAMP
+from database.models.base import Base
+
+
+# Per-user totals of each month of orders archived by `python manage.py archive-order-partitions`, recorded
+# when the month's partition is detached (PostgreSQL): a count and an amount per OrderStatus and the
+# latest order_date. user_order_summary and order_rollups keep counting archived orders; rebuilding the
+# summary adds these rows to the orders table, and the rollups of archived months are left as they are.
+class ArchivedOrderTotals(Base):
+
+    __tablename__ = "archived_order_totals"
+
+    # First day of the archived month
+    month = Column(TIMESTAMP, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    pending_count = Column(Integer, nullable=False, default=0)
+    pending_amount = Column(DECIMAL, nullable=False, default=0)
+    cancelled_count = Column(Integer, nullable=False, default=0)
+    cancelled_amount = Column(DECIMAL, nullable=False, default=0)
+    completed_count = Column(Integer, nullable=False, default=0)
+    completed_amount = Column(DECIMAL, nullable=False, default=0)
+    last_order_at = Column(TIMESTAMP)
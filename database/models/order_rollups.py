@@ -0,0 +1,22 @@
+from sqlalchemy import Column, DECIMAL, Integer, String, TIMESTAMP
+from database.models.base import Base
+
+
+# Order counts and amounts per hour and per day of order_date, maintained by OrderService in the
+# transaction of each order change: a count and an amount per OrderStatus (<status>_count,
+# <status>_amount). A bucket is spread over up to ORDER_ROLLUP_SHARDS rows; its totals are their sum.
+# `python manage.py backfill-order-rollups` recomputes them from the orders table.
+class OrderRollup(Base):
+
+    __tablename__ = "order_rollups"
+
+    # RollupGranularity value
+    granularity = Column(String(8), primary_key=True)
+    bucket_start = Column(TIMESTAMP, primary_key=True)
+    shard = Column(Integer, primary_key=True, default=0)
+    pending_count = Column(Integer, nullable=False, default=0)
+    pending_amount = Column(DECIMAL, nullable=False, default=0)
+    cancelled_count = Column(Integer, nullable=False, default=0)
+    cancelled_amount = Column(DECIMAL, nullable=False, default=0)
+    completed_count = Column(Integer, nullable=False, default=0)
+    completed_amount = Column(DECIMAL, nullable=False, default=0)
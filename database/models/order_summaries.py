@@ -0,0 +1,20 @@
+from sqlalchemy import Column, DECIMAL, ForeignKey, Integer, TIMESTAMP
+from database.models.base import Base
+
+
+# Per-user totals of the orders table, maintained by OrderService in the transaction of each order
+# change: a count and an amount per OrderStatus (<status>_count, <status>_amount) and the latest
+# order_date. Archived months stay counted (see ArchivedOrderTotals). Users without orders have no row.
+# `python manage.py rebuild-order-summary` recomputes it.
+class UserOrderSummary(Base):
+
+    __tablename__ = "user_order_summary"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    pending_count = Column(Integer, nullable=False, default=0)
+    pending_amount = Column(DECIMAL, nullable=False, default=0)
+    cancelled_count = Column(Integer, nullable=False, default=0)
+    cancelled_amount = Column(DECIMAL, nullable=False, default=0)
+    completed_count = Column(Integer, nullable=False, default=0)
+    completed_amount = Column(DECIMAL, nullable=False, default=0)
+    last_order_at = Column(TIMESTAMP)
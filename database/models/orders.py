@@ -1,17 +1,37 @@
-from sqlalchemy import Column, Integer, TIMESTAMP, ForeignKey, DECIMAL
+from sqlalchemy import Column, Integer, TIMESTAMP, ForeignKey, DECIMAL, Index, text
 from sqlalchemy.sql import func
 from config.settings import OrderStatus
 from database.models.base import Base
 from sqlalchemy import Enum as SQLEnum
 
-# Data model for Orders table
+# Data model for Orders table. On PostgreSQL the migrations partition it by month of order_date (see
+# services/order_partition.py), with (id, order_date) as primary key; create_all makes a plain table.
 class Order(Base):
 
     __tablename__ = "orders"
+    __table_args__ = (
+        # Serves keyset pagination of a user's orders (WHERE user_id = ? AND id > ? ORDER BY id);
+        # updated_at and status make the ETag check of a page, which reads only (id, updated_at, status), index-only
+        Index("ix_orders_user_id_id_updated_at_status", "user_id", "id", "updated_at", "status"),
+        # Index-only ETag check of a single order (owner and version by id)
+        Index("ix_orders_id_user_id_updated_at_status", "id", "user_id", "updated_at", "status"),
+        # Serves a user's orders filtered by date range
+        Index("ix_orders_user_id_order_date_id", "user_id", "order_date", "id"),
+        # Pending orders are the hot subset ("pending orders from the last 24h"); keep their index small
+        Index(
+            "ix_orders_pending_order_date_id", "order_date", "id",
+            postgresql_where=text("status = 'pending'"),
+            sqlite_where=text("status = 'pending'"),
+        ),
+    )
+
+    # Read server-generated columns (created_at, updated_at, ...) back with INSERT/UPDATE ... RETURNING
+    # during the flush, instead of a SELECT per object afterwards
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
-    order_date = Column(TIMESTAMP, server_default=func.now())
+    order_date = Column(TIMESTAMP, nullable=False, server_default=func.now())
     total_amount = Column(DECIMAL, nullable=False, default=0.0)
     status = Column(SQLEnum(OrderStatus, name="order_status"), nullable=False, default=OrderStatus.pending)
     created_at = Column(TIMESTAMP, server_default=func.now())
@@ -0,0 +1,19 @@
+from sqlalchemy import Boolean, Column, Float, Index, String
+from database.models.base import Base
+
+
+# Shared token buckets of the rate limiter (AUTH_RATE_LIMIT_SHARED). Times are epoch seconds from the
+# database clock, so workers with skewed clocks agree. A row past full_at is a full bucket and may be deleted.
+class RateLimitBucket(Base):
+
+    __tablename__ = "rate_limit_buckets"
+    __table_args__ = (
+        Index("ix_rate_limit_buckets_full_at", "full_at"),
+    )
+
+    key = Column(String(64), primary_key=True)
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False)
+    full_at = Column(Float, nullable=False)
+    # Whether the last take got a token
+    allowed = Column(Boolean, nullable=False)
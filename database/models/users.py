@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, TIMESTAMP, func
+from sqlalchemy import Column, Index, Integer, String, TIMESTAMP, func
 from .base import Base
 
 
@@ -6,6 +6,10 @@ class User(Base):
 
     __tablename__ = "users"
 
+    # Read server-generated columns (created_at, updated_at, ...) back with INSERT/UPDATE ... RETURNING
+    # during the flush, instead of a SELECT per object afterwards
+    __mapper_args__ = {"eager_defaults": True}
+
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String(255), unique=True, nullable=False)
     email = Column(String(255), unique=True, nullable=False)
@@ -13,3 +17,16 @@ class User(Base):
     role = Column(String(50), default="customer")
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+
+# User search: equality and prefix (LIKE 'term%') on the lower-cased values, whatever the database
+# collation. Substring search also has GIN trigram indexes (ix_users_username_lower_trgm,
+# ix_users_email_lower_trgm), created by migration 6d92e9c95ea8 where pg_trgm is available.
+Index(
+    "ix_users_username_lower_pattern", func.lower(User.username).label("username_lower"),
+    postgresql_ops={"username_lower": "text_pattern_ops"},
+)
+Index(
+    "ix_users_email_lower_pattern", func.lower(User.email).label("email_lower"),
+    postgresql_ops={"email_lower": "text_pattern_ops"},
+)
@@ -0,0 +1,157 @@
+import itertools
+import threading
+import time
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, sessionmaker
+from cache import TTLCache, invalidation_channel
+from config.settings import settings
+from database.database import SessionLocal, AsyncSessionLocal, to_async_url
+from database.instrumentation import instrument
+from metrics import track_engine_pool
+
+PRIMARY_PIN_TOPIC = "primary_pin"
+PRIMARY_PIN_CACHE_SIZE = 100000
+
+# Seconds the replica is behind; 0 on a primary or when everything received has been replayed
+# (an idle primary would otherwise make the last replay timestamp look old)
+LAG_QUERIES = {
+    "postgresql": text(
+        "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+    ),
+}
+
+
+class Replica:
+    def __init__(self, url: str, name: str):
+        self.name = name
+        self.engine = create_engine(url, echo=settings.DB_ECHO, pool_pre_ping=True)
+        instrument(self.engine)
+        track_engine_pool(self.engine, name)
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=self.engine)
+        self.async_engine = None
+        self.async_session_factory = None
+        if settings.DB_ASYNC:
+            from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+            self.async_engine = create_async_engine(to_async_url(url), echo=settings.DB_ECHO, pool_pre_ping=True)
+            instrument(self.async_engine.sync_engine)
+            track_engine_pool(self.async_engine.sync_engine, f"{name}-async")
+            self.async_session_factory = async_sessionmaker(self.async_engine, autoflush=False, expire_on_commit=False)
+        # Unhealthy until the first check passes
+        self.healthy = False
+        self.lag: float | None = None
+
+
+    def check(self, max_lag: float) -> None:
+        try:
+            with self.engine.connect() as conn:
+                query = LAG_QUERIES.get(self.engine.dialect.name)
+                if query is None:
+                    conn.execute(text("SELECT 1"))
+                    self.lag = 0.0
+                else:
+                    self.lag = float(conn.scalar(query))
+            self.healthy = self.lag <= max_lag
+        except SQLAlchemyError:
+            self.lag = None
+            self.healthy = False
+
+
+# Read replicas used by the GET endpoints, round-robin over the healthy ones.
+# A daemon thread re-checks reachability and replication lag every `check_interval` seconds;
+# with no healthy replica (or none configured) reads go to the primary.
+class ReplicaSet:
+    def __init__(self, urls: list[str], max_lag: float, check_interval: float):
+        self.replicas = [Replica(url, f"replica{index}") for index, url in enumerate(urls)]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._next = itertools.count()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+
+    def check(self) -> None:
+        for replica in self.replicas:
+            replica.check(self.max_lag)
+
+
+    def pick(self) -> Replica | None:
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._next) % len(healthy)]
+
+
+    def start(self) -> None:
+        if not self.enabled:
+            return
+        self.check()
+        self._thread = threading.Thread(target=self._run, name="replica-health", daemon=True)
+        self._thread.start()
+
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+    async def dispose(self) -> None:
+        for replica in self.replicas:
+            replica.engine.dispose()
+            if replica.async_engine is not None:
+                await replica.async_engine.dispose()
+
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            self.check()
+
+
+replicas = ReplicaSet(
+    [url.strip() for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()],
+    max_lag=settings.REPLICA_MAX_LAG_SECONDS,
+    check_interval=settings.REPLICA_CHECK_INTERVAL_SECONDS,
+)
+
+
+# Read-your-writes: after a user's request commits on the primary, that user's reads go to the
+# primary for READ_YOUR_WRITES_SECONDS (longer than the tolerated lag). Pins are broadcast to the
+# other workers over the invalidation channel when a backend is configured.
+primary_pins = TTLCache(maxsize=PRIMARY_PIN_CACHE_SIZE)
+
+
+def _pin(user_id: int) -> None:
+    primary_pins.set(user_id, True, expires_at=time.time() + settings.READ_YOUR_WRITES_SECONDS)
+
+
+def pin_to_primary(user_id: int) -> None:
+    _pin(user_id)
+    invalidation_channel.publish(PRIMARY_PIN_TOPIC, user_id)
+
+
+invalidation_channel.subscribe(PRIMARY_PIN_TOPIC, lambda key: _pin(int(key)))
+
+
+# Sessions record whether they committed, so the request can pin its user afterwards
+@event.listens_for(Session, "after_commit")
+def _mark_committed(session: Session) -> None:
+    session.info["committed"] = True
+
+
+# (sync, async) session factories for a read on behalf of `user_id` (None when anonymous):
+# a healthy replica unless the user wrote recently, else the primary
+def read_session_factories(user_id: int | None) -> tuple:
+    replica = None
+    if replicas.enabled and (user_id is None or primary_pins.get(user_id) is None):
+        replica = replicas.pick()
+    if replica is None:
+        return SessionLocal, AsyncSessionLocal
+    return replica.session_factory, replica.async_session_factory
@@ -1,47 +1,59 @@
 from fastapi import FastAPI
-from sqlalchemy.orm import Session
-from database.database import engine, SessionLocal
-from database.models.base import Base
-from database.models.users import User
-from services.user import UserService, UserCreate
-from api import auth, users, orders
+from cache import invalidation_channel, PgNotifyBackend
+from config.settings import settings
+from database.database import engine, async_engine
+from database.replicas import replicas
+from rate_limit import auth_rate_limiter, PgBucketStore
+from security import password_hasher
+from startup import create_order_partitions, prepare_schema, seed
+from api import auth, users, orders, analytics, metrics
+from middleware.metrics import MetricsMiddleware
+from middleware.query_stats import QueryStatsMiddleware
 from contextlib import asynccontextmanager
 
 
-# Seed function to ensure an admin user exists.
-def seed_admin_user():
-    db: Session = SessionLocal()
-    try:
-        user_service = UserService(db)
-        existing_admin = db.query(User).filter_by(username="admin").first()
-        if not existing_admin:
-            admin_data = UserCreate(
-                username="admin",
-                email="admin@example.com",
-                password="AdminPass123",
-                role="admin"
-            )
-            user_service.create_user(admin_data)
-            print("Admin user seeded.")
-        else:
-            print("Admin user already exists.")
-    finally:
-        db.close()
-
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Create tables if they don't exist
-    Base.metadata.create_all(bind=engine)
-    seed_admin_user()
+    # Start the bcrypt worker processes before the first login arrives
+    password_hasher.start()
+    # Broadcast cache invalidations (e.g. cached user principals) to the other workers
+    if settings.CACHE_INVALIDATION_CHANNEL:
+        invalidation_channel.backend = PgNotifyBackend(engine, settings.CACHE_INVALIDATION_CHANNEL, invalidation_channel)
+        invalidation_channel.backend.start()
+    # Share the /auth rate-limit buckets between workers
+    if settings.AUTH_RATE_LIMIT_SHARED:
+        auth_rate_limiter.backend = PgBucketStore(engine)
+    # Create tables if they don't exist (skipped when the database is at the Alembic head, see STARTUP_SCHEMA_CHECK)
+    prepare_schema(engine)
+    # Default roles, privileges and admin user; with STARTUP_SEED off, `python manage.py seed` does it once per deploy
+    if settings.STARTUP_SEED:
+        seed(engine)
+    # Month partitions of orders ahead of the current month (PostgreSQL, once partitioned by the migrations)
+    create_order_partitions(engine)
+    # Health/lag checks for the read replicas (no-op without DATABASE_REPLICA_URLS)
+    replicas.start()
     yield
+    replicas.stop()
+    await replicas.dispose()
+    if invalidation_channel.backend is not None:
+        invalidation_channel.backend.stop()
+    password_hasher.shutdown()
+    if async_engine is not None:
+        await async_engine.dispose()
 
 
 app = FastAPI(title="User and Order Management API", lifespan=lifespan)
+app.add_middleware(QueryStatsMiddleware)
+if settings.METRICS_ENABLED:
+    # Added last so it wraps everything, including the Server-Timing middleware
+    app.add_middleware(MetricsMiddleware)
 
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(orders.router)
+app.include_router(analytics.router)
+if settings.METRICS_ENABLED:
+    app.include_router(metrics.router)
 
 
 @app.get("/")
@@ -0,0 +1,155 @@
+"""Operational commands, run against the configured DATABASE_URL.
+
+    python manage.py seed                                  # default roles, privileges and the admin user (idempotent)
+    python manage.py check-schema                          # exit 1 unless the database is at the Alembic head revision
+    python manage.py rebuild-order-summary [--user-id ID]  # recompute user_order_summary from the orders (and archived totals)
+    python manage.py verify-order-summary                  # exit 1 if user_order_summary differs from the orders
+    python manage.py backfill-order-rollups [--from DATE] [--to DATE]
+                                                           # recompute order_rollups from the orders (archived months kept)
+    python manage.py create-order-partitions [--months-ahead N]
+                                                           # month partitions of orders ahead (PostgreSQL)
+    python manage.py archive-order-partitions [--older-than-months N] [--dry-run]
+                                                           # detach old months without pending orders
+
+With STARTUP_SEED=false the app no longer seeds on every worker start; run `seed` once per deploy,
+after `alembic upgrade head`.
+"""
+import argparse
+import sys
+from datetime import datetime
+
+
+def seed_command(args) -> int:
+    from database.database import engine
+    from security import password_hasher
+    from startup import seed
+
+    try:
+        seed(engine)
+    finally:
+        password_hasher.shutdown()
+    return 0
+
+
+def check_schema_command(args) -> int:
+    from database.database import engine
+    from startup import database_revisions, migration_heads
+
+    with engine.connect() as conn:
+        current = database_revisions(conn)
+    heads = migration_heads()
+    print(f"database: {', '.join(sorted(current)) if current else 'no Alembic revision'}; migrations: {', '.join(sorted(heads))}")
+    return 0 if current == heads else 1
+
+
+def rebuild_order_summary_command(args) -> int:
+    from database.database import SessionLocal
+    from services.order_summary import OrderSummaryService
+
+    with SessionLocal() as db:
+        rows = OrderSummaryService(db).rebuild(args.user_id)
+    print(f"rebuilt {rows} summary row(s)")
+    return 0
+
+
+def verify_order_summary_command(args) -> int:
+    from database.database import SessionLocal
+    from services.order_summary import OrderSummaryService
+
+    with SessionLocal() as db:
+        mismatches = OrderSummaryService(db).verify()
+    for user_id, column, expected, stored in mismatches:
+        print(f"user {user_id}: {column} is {stored}, orders give {expected}")
+    print(f"{len({mismatch[0] for mismatch in mismatches})} user(s) with a summary that differs from their orders")
+    return 1 if mismatches else 0
+
+
+def backfill_order_rollups_command(args) -> int:
+    from database.database import SessionLocal
+    from services.order_rollup import OrderRollupService
+
+    with SessionLocal() as db:
+        rows = OrderRollupService(db).backfill(args.date_from, args.date_to)
+    print(f"backfilled {rows} rollup row(s)")
+    return 0
+
+
+def create_order_partitions_command(args) -> int:
+    from sqlalchemy.orm import Session
+    from config.settings import settings
+    from database.database import engine
+    from services.order_partition import OrderPartitionService
+    from startup import run_exclusive
+
+    months_ahead = settings.ORDER_PARTITION_MONTHS_AHEAD if args.months_ahead is None else args.months_ahead
+    created = []
+
+    def create(conn) -> None:
+        with Session(bind=conn) as db:
+            created.extend(OrderPartitionService(db).ensure(months_ahead))
+
+    run_exclusive(engine, create)
+    print(f"created {len(created)} partition(s){': ' + ', '.join(created) if created else ''}")
+    return 0
+
+
+def archive_order_partitions_command(args) -> int:
+    from sqlalchemy.orm import Session
+    from config.settings import settings
+    from database.database import engine
+    from services.order_partition import OrderPartitionService
+    from startup import run_exclusive
+
+    older_than_months = settings.ORDER_ARCHIVE_AFTER_MONTHS if args.older_than_months is None else args.older_than_months
+    outcomes = []
+
+    def archive(conn) -> None:
+        with Session(bind=conn) as db:
+            outcomes.extend(OrderPartitionService(db).archive(older_than_months, args.dry_run))
+
+    run_exclusive(engine, archive)
+    for partition, outcome in outcomes:
+        print(f"{partition}: {outcome}")
+    print(f"{len(outcomes)} partition(s) ended {older_than_months} or more months ago")
+    return 0
+
+
+COMMANDS = {
+    "seed": (seed_command, "Seed the default roles, privileges and admin user"),
+    "check-schema": (check_schema_command, "Exit 1 unless the database is at the Alembic head revision"),
+    "rebuild-order-summary": (rebuild_order_summary_command, "Recompute user_order_summary from the orders table"),
+    "verify-order-summary": (verify_order_summary_command, "Exit 1 if user_order_summary differs from the orders table"),
+    "backfill-order-rollups": (backfill_order_rollups_command, "Recompute the hourly and daily order rollups of the months still in the orders table"),
+    "create-order-partitions": (create_order_partitions_command, "Create the month partitions of orders ahead of the current month"),
+    "archive-order-partitions": (archive_order_partitions_command, "Detach the old month partitions of orders without pending orders"),
+}
+
+# Command arguments, as (flags, add_argument keyword arguments)
+ARGUMENTS = {
+    "rebuild-order-summary": [(("--user-id",), {"type": int, "help": "Only this user's row (default: every user)"})],
+    "backfill-order-rollups": [
+        (("--from",), {"dest": "date_from", "metavar": "DATE", "type": datetime.fromisoformat, "help": "Orders dated on or after this day (default: all)"}),
+        (("--to",), {"dest": "date_to", "metavar": "DATE", "type": datetime.fromisoformat, "help": "Orders dated before this (default: all); widened to whole days"}),
+    ],
+    "create-order-partitions": [(("--months-ahead",), {"type": int, "metavar": "N", "help": "Months after the current one (default: ORDER_PARTITION_MONTHS_AHEAD)"})],
+    "archive-order-partitions": [
+        (("--older-than-months",), {"type": int, "metavar": "N", "help": "Months that ended at least N months ago (default: ORDER_ARCHIVE_AFTER_MONTHS)"}),
+        (("--dry-run",), {"action": "store_true", "help": "Only list what would be archived"}),
+    ],
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (handler, help_text) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text)
+        for flags, options in ARGUMENTS.get(name, []):
+            subparser.add_argument(*flags, **options)
+        subparser.set_defaults(handler=handler)
+    args = parser.parse_args()
+    sys.exit(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import bisect
+import threading
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Minimal in-process Prometheus metrics. Label values are passed positionally in `labelnames` order.
+# Updates take a lock: most come from the event loop, but bcrypt timings and pool events come from threads.
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self._samples())
+        return lines
+
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}" for labels, value in values]
+
+
+# A gauge either holds values set by the app or reads them at scrape time from `function`,
+# which returns {label values tuple: value}.
+class Gauge(Metric):
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), function=None):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+        self._function = function
+
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+    def dec(self, *labels, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+    def _samples(self) -> list[str]:
+        if self._function is not None:
+            values = sorted(self._function().items())
+        else:
+            with self._lock:
+                values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}" for labels, value in values]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (last one is +Inf), sum, count]
+        self._series: dict[tuple, list] = {}
+
+
+    def observe(self, value: float, *labels) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            snapshot = sorted((labels, (list(counts), total, count)) for labels, (counts, total, count) in self._series.items())
+        lines = []
+        for labels, (counts, total, count) in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels((*self.labelnames, "le"), (*labels, _format_value(bound)))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            series_labels = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{series_labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{series_labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[Metric] = []
+
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+
+    # Prometheus text exposition format (version 0.0.4)
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# HTTP (recorded by middleware.metrics.MetricsMiddleware)
+http_requests_total = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route template and status code", ("method", "route", "status")))
+http_request_duration_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "Time from receiving a request to the end of its response", ("method", "route")))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "Requests being handled (the route is only known once routing is done)", ("method",)))
+
+# Password hashing (recorded by security.PasswordHasher)
+password_hash_duration_seconds = registry.register(Histogram(
+    "password_hash_duration_seconds", "bcrypt hash/verify time, including the wait for a hashing worker", ("operation",)))
+password_hash_rejected_total = registry.register(Counter(
+    "password_hash_rejected_total", "Hash/verify calls answered with 503 because too many were in flight", ("operation",)))
+
+# Rate limiting (recorded by rate_limit.RateLimiter)
+rate_limited_total = registry.register(Counter(
+    "rate_limited_total", "Requests answered with 429 by the rate limiter, by limit", ("limit",)))
+
+
+# Connection pools of the engines passed to track_engine_pool, by engine label
+_engines: dict[str, object] = {}
+
+db_pool_checkouts_total = registry.register(Counter(
+    "db_pool_checkouts_total", "Connections checked out of the pool", ("engine",)))
+db_pool_connections_opened_total = registry.register(Counter(
+    "db_pool_connections_opened_total", "New database connections opened by the pool (churn when it keeps rising)", ("engine",)))
+
+
+def _pool_stat(read) -> dict:
+    return {(label,): read(engine.pool) for label, engine in _engines.items()}
+
+
+registry.register(Gauge("db_pool_size", "Configured pool size", ("engine",), function=lambda: _pool_stat(lambda pool: pool.size())))
+registry.register(Gauge("db_pool_checked_out", "Connections currently checked out", ("engine",), function=lambda: _pool_stat(lambda pool: pool.checkedout())))
+registry.register(Gauge("db_pool_checked_in", "Idle connections in the pool", ("engine",), function=lambda: _pool_stat(lambda pool: pool.checkedin())))
+registry.register(Gauge("db_pool_overflow", "Connections open beyond the pool size (negative while the pool is filling)", ("engine",), function=lambda: _pool_stat(lambda pool: pool.overflow())))
+
+
+# Export `engine`'s QueuePool gauges and count checkouts and new connections with the pool's checkout and
+# connect events. Other pool classes (e.g. SQLite in-memory) have no size/overflow and are skipped.
+def track_engine_pool(engine, label: str) -> None:
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return
+    _engines[label] = engine
+    event.listen(pool, "checkout", lambda dbapi_connection, connection_record, connection_proxy: db_pool_checkouts_total.inc(label))
+    event.listen(pool, "connect", lambda dbapi_connection, connection_record: db_pool_connections_opened_total.inc(label))
+
+
+# Threadpool that runs sync dependencies and ThreadedSession calls (anyio's default limiter).
+# Read at scrape time, which happens on the event loop.
+def _threadpool_stat(read) -> dict:
+    from anyio.to_thread import current_default_thread_limiter
+    return {(): read(current_default_thread_limiter())}
+
+
+registry.register(Gauge("threadpool_threads_busy", "Worker threads currently running a task", function=lambda: _threadpool_stat(lambda limiter: limiter.borrowed_tokens)))
+registry.register(Gauge("threadpool_threads_max", "Maximum number of worker threads", function=lambda: _threadpool_stat(lambda limiter: limiter.total_tokens)))
+registry.register(Gauge("threadpool_tasks_waiting", "Tasks queued for a free worker thread (saturation)", function=lambda: _threadpool_stat(lambda limiter: limiter.statistics().tasks_waiting)))
@@ -1,10 +1,17 @@
-from fastapi import Depends, HTTPException, status
+from datetime import datetime
+from fastapi import Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from jose import JWTError, jwt
-from config.settings import settings
-from database.database import SessionLocal
-from database.models.users import User
+import jwt
+from config.settings import settings, OrderStatus
+from database.database import SessionLocal, AsyncSessionLocal, ThreadedSession
+from database.replicas import replicas, pin_to_primary, read_session_factories
+from security import decode_token
+from services.order import OrderFilter
+from services.pagination import PageRequest, decode_cursor, decode_ranked_cursor
+from services.role import AsyncRoleService, PrivilegeMatrix, privilege_matrix
+from services.user import AsyncUserService, UserPrincipal, principal_cache, cache_principal
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
@@ -18,21 +25,138 @@ def get_db() -> Session:
         db.close()
 
 
-# Retrieve user currently logged in
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+# User id from the request's bearer token, or None (no token, or an invalid one).
+# Only used for routing; authentication itself is get_current_user's job.
+def request_user_id(request: Request) -> int | None:
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return int(decode_token(token)["sub"])
+    except (jwt.InvalidTokenError, KeyError, ValueError):
+        return None
+
+
+# A request that committed on the primary keeps its user's reads on the primary for a while.
+# The pin is broadcast on a connection of its own, so it runs on the threadpool.
+async def pin_writer(request: Request, db) -> None:
+    if replicas.enabled and db.sync_session.info.get("committed"):
+        user_id = request_user_id(request)
+        if user_id is not None:
+            await run_in_threadpool(pin_to_primary, user_id)
+
+
+# Get a primary database session for async routes: an AsyncSession when DB_ASYNC is on,
+# otherwise a sync session whose calls run on the threadpool
+async def get_async_db(request: Request):
+    if AsyncSessionLocal is None:
+        db = ThreadedSession(SessionLocal())
+        try:
+            yield db
+        finally:
+            await pin_writer(request, db)
+            await db.close()
+    else:
+        async with AsyncSessionLocal() as db:
+            try:
+                yield db
+            finally:
+                await pin_writer(request, db)
+
+
+# Get a read-only database session for GET routes: a healthy read replica when configured,
+# or the primary when there is none or the user wrote within READ_YOUR_WRITES_SECONDS
+async def get_read_db(request: Request):
+    session_factory, async_session_factory = read_session_factories(request_user_id(request))
+    if async_session_factory is None:
+        db = ThreadedSession(session_factory())
+        try:
+            yield db
+        finally:
+            await db.close()
+    else:
+        async with async_session_factory() as db:
+            yield db
+
+
+# Retrieve user currently logged in, as a cached snapshot (see services.user.principal_cache)
+async def get_current_user(token: str = Depends(oauth2_scheme), db = Depends(get_async_db)) -> UserPrincipal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+        # Signature is verified once per token; repeat requests hit the token cache
+        payload = decode_token(token)
         user_id: str = payload.get("sub")
         if user_id is None:
             raise credentials_exception
-    except JWTError:
+    except jwt.InvalidTokenError:
         raise credentials_exception
-    user = db.query(User).filter(User.id == int(user_id)).first()
-    if user is None:
-        raise credentials_exception
-    return user
\ No newline at end of file
+    # Cache hits skip the database entirely
+    principal = principal_cache.get(int(user_id))
+    if principal is None:
+        user = await AsyncUserService(db).get_user(int(user_id))
+        if user is None:
+            raise credentials_exception
+        principal = cache_principal(user)
+    return principal
+
+
+# Compiled role -> privilege matrix; only queries when it was invalidated since the last load
+async def get_privilege_matrix(db = Depends(get_async_db)) -> PrivilegeMatrix:
+    if not privilege_matrix.loaded:
+        await AsyncRoleService(db).load_privilege_matrix()
+    return privilege_matrix
+
+
+# Dependency factory: the current user, provided their role grants `privilege`, else 403
+def require_privilege(privilege: str):
+    async def dependency(
+        current_user: UserPrincipal = Depends(get_current_user),
+        privileges: PrivilegeMatrix = Depends(get_privilege_matrix),
+    ) -> UserPrincipal:
+        if not privileges.has(current_user.role, privilege):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+        return current_user
+    return dependency
+
+
+# Parse keyset pagination parameters shared by the list endpoints
+def get_page_request(
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    cursor: str | None = Query(None, description="Opaque cursor returned as next_cursor by the previous page"),
+) -> PageRequest:
+    if cursor is None:
+        return PageRequest(limit=limit)
+    try:
+        return PageRequest(limit=limit, after_id=decode_cursor(cursor))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+# Same parameters for lists ordered by relevance, whose cursors carry the last row's rank
+def get_ranked_page_request(
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    cursor: str | None = Query(None, description="Opaque cursor returned as next_cursor by the previous page"),
+) -> PageRequest:
+    if cursor is None:
+        return PageRequest(limit=limit)
+    try:
+        rank, after_id = decode_ranked_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return PageRequest(limit=limit, after_id=after_id, after_rank=rank)
+
+
+
+# Parse the order list filters (?status=&from=&to=&min_amount=&max_amount=)
+def get_order_filter(
+    order_status: OrderStatus | None = Query(None, alias="status"),
+    date_from: datetime | None = Query(None, alias="from", description="Ordered at or after (inclusive)"),
+    date_to: datetime | None = Query(None, alias="to", description="Ordered before (exclusive)"),
+    min_amount: float | None = Query(None, ge=0),
+    max_amount: float | None = Query(None, ge=0),
+) -> OrderFilter:
+    return OrderFilter(status=order_status, date_from=date_from, date_to=date_to, min_amount=min_amount, max_amount=max_amount)
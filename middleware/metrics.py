@@ -0,0 +1,41 @@
+import time
+from metrics import http_requests_total, http_request_duration_seconds, http_requests_in_flight
+
+# Methods recorded as themselves; any other method a client sends is labelled "other"
+STANDARD_METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "CONNECT", "TRACE"})
+
+
+# Pure ASGI middleware recording request count, latency and in-flight requests.
+# Requests are labelled with the matched route template (e.g. /orders/{order_id}), never the raw
+# path, and with one of STANDARD_METHODS or "other", so the number of series stays bounded; requests
+# no route matched are labelled "unmatched".
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"] if scope["method"] in STANDARD_METHODS else "other"
+        status_code = 500
+        started = time.perf_counter()
+        http_requests_in_flight.inc(method)
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec(method)
+            # The router stores the matched route in the (shared) scope
+            route = scope.get("route")
+            template = route.path if route is not None else "unmatched"
+            http_request_duration_seconds.observe(time.perf_counter() - started, method, template)
+            http_requests_total.inc(method, template, str(status_code))
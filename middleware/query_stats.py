@@ -0,0 +1,39 @@
+import logging
+from config.settings import settings
+from database.instrumentation import QueryStats, current_query_stats
+
+logger = logging.getLogger("sql")
+
+
+# Pure ASGI middleware: collects the statements each HTTP request runs, reports them in a
+# Server-Timing header and logs a per-request summary (with the slowest statement) at DEBUG.
+# Statements run after the response has started (streamed exports) only reach the log.
+class QueryStatsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(method=scope["method"], path=scope["path"])
+        token = current_query_stats.set(stats)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and settings.DB_SERVER_TIMING:
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_query_stats.reset(token)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "%s %s: %d statements, %.2f ms in the database, slowest %.2f ms: %s",
+                    stats.method, stats.path, stats.statements, stats.total_ms, stats.slowest_ms, stats.slowest_statement,
+                )
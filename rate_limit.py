@@ -0,0 +1,113 @@
+import hashlib
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import case, delete, func
+from sqlalchemy.dialects.postgresql import insert
+from config.settings import settings
+from database.models.rate_limits import RateLimitBucket
+from metrics import rate_limited_total
+
+
+# A token bucket: `burst` tokens, refilled at `rate` tokens per second
+@dataclass(frozen=True)
+class Limit:
+    name: str
+    rate: float
+    burst: int
+
+
+# In-process buckets, (tokens, last update) per key, with LRU eviction beyond `maxsize` keys
+# (an evicted bucket comes back full). take() has no await, so on the event loop each call runs
+# to completion without interleaving and needs no lock.
+class MemoryBucketStore:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._buckets: OrderedDict = OrderedDict()
+
+
+    # Take a token from `key`'s bucket: 0 when taken, else seconds until one is available
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = float(burst)
+        else:
+            tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            self._buckets.move_to_end(key)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+# Buckets shared by every worker in the rate_limit_buckets table (PostgreSQL): one INSERT ... ON CONFLICT
+# DO UPDATE per take refills and takes atomically on the row, using the database clock.
+# Every `prune_every` takes, rows whose bucket is full again are deleted.
+class PgBucketStore:
+    def __init__(self, engine, prune_every: int = 1000):
+        self.engine = engine
+        self.prune_every = prune_every
+        self._takes = 0
+
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        return await run_in_threadpool(self._take, key, rate, burst)
+
+
+    def _take(self, key: str, rate: float, burst: int) -> float:
+        table = RateLimitBucket.__table__
+        now = func.extract("epoch", func.clock_timestamp())
+        refilled = func.least(burst, table.c.tokens + (now - table.c.updated_at) * rate)
+        tokens = case((refilled >= 1, refilled - 1), else_=refilled)
+        statement = insert(table).values(key=key, tokens=burst - 1, updated_at=now, full_at=now + 1 / rate, allowed=True)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.key],
+            set_={"tokens": tokens, "updated_at": now, "full_at": now + (burst - tokens) / rate, "allowed": refilled >= 1},
+        ).returning(table.c.tokens, table.c.allowed)
+        with self.engine.connect() as conn:
+            remaining, allowed = conn.execute(statement).one()
+            self._takes += 1
+            if self._takes % self.prune_every == 0:
+                conn.execute(delete(table).where(table.c.full_at < now))
+            conn.commit()
+        return 0.0 if allowed else (1 - remaining) / rate
+
+
+class RateLimiter:
+    def __init__(self, backend):
+        self.backend = backend
+
+
+    # Take a token for each (limit, key); the first empty bucket answers 429 with Retry-After.
+    # Keys are hashed: fixed size whatever the client sends, and no usernames or IPs in the store.
+    async def check(self, *limits: tuple[Limit, str]) -> None:
+        for limit, key in limits:
+            digest = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+            wait = await self.backend.take(f"{limit.name}:{digest}", limit.rate, limit.burst)
+            if wait > 0:
+                rate_limited_total.inc(limit.name)
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many attempts, please retry later",
+                    headers={"Retry-After": str(math.ceil(wait))},
+                )
+
+
+AUTH_IP_LIMIT = Limit("auth_ip", settings.AUTH_IP_RATE, settings.AUTH_IP_BURST)
+AUTH_USERNAME_LIMIT = Limit("auth_username", settings.AUTH_USERNAME_RATE, settings.AUTH_USERNAME_BURST)
+
+# Rate limiter of the /auth endpoints; main swaps in PgBucketStore when AUTH_RATE_LIMIT_SHARED is set
+auth_rate_limiter = RateLimiter(MemoryBucketStore(settings.AUTH_RATE_LIMIT_KEYS))
@@ -1,19 +1,139 @@
+import asyncio
+import hashlib
+import multiprocessing
+import threading
+import time
 import jwt
+from concurrent.futures import Future, ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
-from passlib.context import CryptContext
 from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from cache import TTLCache
 from config.settings import settings
+from metrics import password_hash_duration_seconds, password_hash_rejected_total
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt context, created once per process (in the pool workers, or in the app process in inline mode)
+_pwd_context = None
+
+
+def _get_pwd_context():
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
+
+def _hash(password: str) -> str:
+    return _get_pwd_context().hash(password)
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return _get_pwd_context().verify(plain_password, hashed_password)
+
+
+# Single password-hashing component for the whole app.
+# bcrypt runs in a process pool so a login burst cannot pin the GIL of the serving process.
+# At most `max_pending` hash/verify calls may be queued or running; beyond that callers get
+# an immediate 503 instead of piling up behind the pool. workers=0 hashes in the calling thread.
+class PasswordHasher:
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+
+    def start(self) -> None:
+        if self.workers > 0 and self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # spawn: never fork a process that holds DB connections and event-loop threads
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+
+    def _acquire(self, operation: str) -> None:
+        if not self._slots.acquire(blocking=False):
+            password_hash_rejected_total.inc(operation)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+
+
+    def _submit(self, operation: str, fn, *args) -> Future:
+        self.start()
+        self._acquire(operation)
+        started = time.perf_counter()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        def done(_):
+            self._slots.release()
+            password_hash_duration_seconds.observe(time.perf_counter() - started, operation)
+
+        future.add_done_callback(done)
+        return future
+
+
+    def _run_inline(self, operation: str, fn, *args):
+        self._acquire(operation)
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self._slots.release()
+            password_hash_duration_seconds.observe(time.perf_counter() - started, operation)
+
+
+    def hash(self, password: str) -> str:
+        if self.workers == 0:
+            return self._run_inline("hash", _hash, password)
+        return self._submit("hash", _hash, password).result()
+
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        if self.workers == 0:
+            return self._run_inline("verify", _verify, plain_password, hashed_password)
+        return self._submit("verify", _verify, plain_password, hashed_password).result()
+
+
+    async def hash_async(self, password: str) -> str:
+        if self.workers == 0:
+            return await run_in_threadpool(self._run_inline, "hash", _hash, password)
+        return await asyncio.wrap_future(self._submit("hash", _hash, password))
+
+
+    async def verify_async(self, plain_password: str, hashed_password: str) -> bool:
+        if self.workers == 0:
+            return await run_in_threadpool(self._run_inline, "verify", _verify, plain_password, hashed_password)
+        return await asyncio.wrap_future(self._submit("verify", _verify, plain_password, hashed_password))
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING)
 
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return password_hasher.hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.verify(plain_password, hashed_password)
 
 
 def create_access_token(data: dict) -> str:
@@ -30,11 +150,30 @@ def create_refresh_token(data: dict) -> str:
     return jwt.encode(to_encode, settings.JWT_REFRESH_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
 
 
+# Verified token claims keyed by token digest, kept until the token's own `exp`.
+# Clients resend the same token many times, so the signature is verified once per token.
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_SIZE)
+
+
+# Decode and verify a token, serving repeat tokens from token_cache.
+# Raises jwt.InvalidTokenError (or a subclass) for invalid or expired tokens.
+# The returned claims are shared between requests and must not be mutated.
+def decode_token(token: str, is_refresh: bool = False) -> dict:
+    key = (is_refresh, hashlib.sha256(token.encode()).digest())
+    payload = token_cache.get(key)
+    if payload is not None:
+        return payload
+    secret = settings.JWT_REFRESH_SECRET_KEY if is_refresh else settings.JWT_SECRET_KEY
+    payload = jwt.decode(token, secret, algorithms=[settings.JWT_ALGORITHM])
+    # Tokens without an expiry are verified every time
+    if isinstance(payload.get("exp"), (int, float)):
+        token_cache.set(key, payload, expires_at=payload["exp"])
+    return payload
+
+
 def verify_token(token: str, is_refresh: bool = False) -> dict:
     try:
-        secret = settings.JWT_REFRESH_SECRET_KEY if is_refresh else settings.JWT_SECRET_KEY
-        payload = jwt.decode(token, secret, algorithms=[settings.JWT_ALGORITHM])
-        return payload
+        return decode_token(token, is_refresh=is_refresh)
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has expired")
     except jwt.InvalidTokenError:
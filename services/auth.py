@@ -1,11 +1,10 @@
 from datetime import timedelta, datetime, timezone
-from jose import jwt
+import jwt
 from sqlalchemy.orm import Session
 from database.models.users import User
 from config.settings import settings
-from passlib.context import CryptContext
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from security import password_hasher
+from services.base import AsyncService
 
 
 class AuthService:
@@ -13,11 +12,15 @@ class AuthService:
         self.db = db
 
 
+    def get_user_by_username(self, username: str) -> User | None:
+        return self.db.query(User).filter(User.username == username).first()
+
+
     def authenticate_user(self, username: str, password: str) -> User:
-        user = self.db.query(User).filter(User.username == username).first()
+        user = self.get_user_by_username(username)
         if not user:
             raise ValueError("User not found")
-        if not pwd_context.verify(password, user.hashed_password):
+        if not password_hasher.verify(password, user.hashed_password):
             raise ValueError("Incorrect password")
         return user
 
@@ -35,4 +38,27 @@ class AuthService:
         expire = datetime.now(timezone.utc) + expires_delta
         to_encode.update({"exp": expire})
         encoded_jwt = jwt.encode(to_encode, settings.JWT_REFRESH_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
-        return encoded_jwt
\ No newline at end of file
+        return encoded_jwt
+
+
+class AsyncAuthService(AsyncService):
+    service_class = AuthService
+
+
+    async def authenticate_user(self, username: str, password: str) -> User:
+        user = await self.get_user_by_username(username)
+        if not user:
+            raise ValueError("User not found")
+        # bcrypt runs in the hashing pool; the event loop only awaits the result
+        if not await password_hasher.verify_async(password, user.hashed_password):
+            raise ValueError("Incorrect password")
+        return user
+
+
+    # Token signing is cheap and needs no session
+    def create_access_token(self, user: User, **kwargs) -> str:
+        return AuthService(self.db).create_access_token(user, **kwargs)
+
+
+    def create_refresh_token(self, user: User, **kwargs) -> str:
+        return AuthService(self.db).create_refresh_token(user, **kwargs)
@@ -0,0 +1,21 @@
+# Awaitable facade over a sync service.
+# Every method of `service_class` is exposed as a coroutine that runs the sync method through
+# `db.run_sync`: with an AsyncSession the ORM code runs in a greenlet on the event loop while the
+# driver IO is awaited natively; with a ThreadedSession (sync mode) it runs on the threadpool.
+# Subclasses override methods that hash passwords so bcrypt never runs on the event loop.
+class AsyncService:
+    service_class: type
+
+    def __init__(self, db):
+        self.db = db
+
+
+    def __getattr__(self, name: str):
+        method = getattr(self.service_class, name)
+
+        async def call(*args, **kwargs):
+            return await self.db.run_sync(lambda session: method(self.service_class(session), *args, **kwargs))
+
+        call.__name__ = name
+        return call
+
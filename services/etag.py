@@ -0,0 +1,36 @@
+import hashlib
+from fastapi import Request, Response, status
+
+# Responses are per user: browsers and apps may keep them but must revalidate, shared caches must not store them
+CACHE_CONTROL = "private, no-cache"
+
+
+# Weak ETag from the row versions a representation is built from, e.g. ("order", id, updated_at, status).
+# Weak because it tracks the row version and the fields that change, not the response bytes.
+def make_etag(*parts) -> str:
+    return 'W/"' + hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest() + '"'
+
+
+# ETag of one page of a list: the version rows on it and whether another page follows
+def page_etag(versions, next_cursor: str | None) -> str:
+    return make_etag("page", [tuple(version) for version in versions], next_cursor)
+
+
+# Weak comparison against If-None-Match, as RFC 9110 prescribes for GET
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def set_etag(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
@@ -0,0 +1,64 @@
+import csv
+import io
+import json
+from collections.abc import Iterable
+from enum import Enum
+
+
+class ExportFormat(str, Enum):
+    ndjson = 'ndjson'
+    csv = 'csv'
+
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv",
+}
+
+
+def _plain(value):
+    if isinstance(value, Enum):
+        return value.value
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def _row_dict(row, columns: list[str]) -> dict:
+    record = {name: _plain(value) for name, value in zip(columns, row)}
+    # Same representation as OrderResponse
+    if record.get("total_amount") is not None:
+        record["total_amount"] = float(record["total_amount"])
+    return record
+
+
+# Newline-delimited JSON: no header, one object per line
+def ndjson_header(columns: list[str]) -> str:
+    return ""
+
+
+def ndjson_rows(rows: Iterable, columns: list[str]) -> str:
+    return "".join(json.dumps(_row_dict(row, columns), separators=(",", ":")) + "\n" for row in rows)
+
+
+# CSV with a header line
+def csv_header(columns: list[str]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(columns)
+    return buffer.getvalue()
+
+
+def csv_rows(rows: Iterable, columns: list[str]) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        record = _row_dict(row, columns)
+        writer.writerow([record[name] for name in columns])
+    return buffer.getvalue()
+
+
+# Each format is a (header, batch encoder) pair; the encoder turns one batch of rows into one text chunk
+SERIALIZERS = {
+    ExportFormat.ndjson: (ndjson_header, ndjson_rows),
+    ExportFormat.csv: (csv_header, csv_rows),
+}
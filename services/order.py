@@ -1,15 +1,63 @@
-from sqlalchemy.orm import Session
+from collections.abc import AsyncIterator, Iterator
+from datetime import datetime
+from sqlalchemy import and_, cast, delete, insert, null, select, update
+from sqlalchemy.orm import Session, aliased
+from config.settings import OrderStatus, settings
 from database.models.orders import Order
+from services.base import AsyncService
+from services.order_rollup import changes_upsert, record_changes
+from services.order_summary import deleted_update, record_created, record_deleted, record_status_changes, status_changes_update
+from services.pagination import PageRequest, paginate
 from pydantic import BaseModel
 
+# Columns written by the bulk export, in output order
+EXPORT_COLUMNS = [Order.id, Order.user_id, Order.order_date, Order.total_amount, Order.status, Order.created_at, Order.updated_at]
+# The fields of validators.orders.OrderResponse, in order (fast list serialization)
+ORDER_RESPONSE_COLUMNS = [Order.id, Order.user_id, Order.total_amount, Order.status]
+# What an order's ETag is derived from: updated_at has a one-second resolution on SQLite, and status,
+# the only field that changes, tells apart two updates within the same second
+ORDER_VERSION_COLUMNS = [Order.id, Order.updated_at, Order.status]
+# Fast serialization columns plus updated_at, so the page's ETag comes from the same query
+ORDER_RESPONSE_VERSION_COLUMNS = [*ORDER_RESPONSE_COLUMNS, Order.updated_at]
+ORDERS = Order.__table__
+
 
 class OrderCreate(BaseModel):
     total_amount: float
-    status: str = "pending"
+    status: OrderStatus = OrderStatus.pending
 
 
 class OrderUpdate(BaseModel):
-    status: str | None = None
+    status: OrderStatus | None = None
+
+
+# Filters for order listings; the date range applies to order_date (from inclusive, to exclusive), the
+# partition key of orders on PostgreSQL, so only the partitions of the range are read
+# and the amount range to total_amount (both bounds inclusive)
+class OrderFilter(BaseModel):
+    user_id: int | None = None
+    status: OrderStatus | None = None
+    date_from: datetime | None = None
+    date_to: datetime | None = None
+    min_amount: float | None = None
+    max_amount: float | None = None
+
+
+    def conditions(self) -> list:
+        conditions = []
+        if self.user_id is not None:
+            conditions.append(Order.user_id == self.user_id)
+        if self.status is not None:
+            conditions.append(Order.status == self.status)
+        if self.date_from is not None:
+            conditions.append(Order.order_date >= self.date_from)
+        if self.date_to is not None:
+            conditions.append(Order.order_date < self.date_to)
+        if self.min_amount is not None:
+            conditions.append(Order.total_amount >= self.min_amount)
+        if self.max_amount is not None:
+            conditions.append(Order.total_amount <= self.max_amount)
+        return conditions
 
 
 class OrderService:
@@ -24,38 +72,245 @@ class OrderService:
             status=order_data.status
         )
         self.db.add(new_order)
+        self.db.flush()
+        record_created(self.db, [new_order])
+        record_changes(self.db, [(new_order.user_id, new_order.order_date, None, new_order.status, new_order.total_amount)])
         self.db.commit()
-        self.db.refresh(new_order)
         return new_order
 
 
+    # Insert all orders with one multi-row INSERT ... RETURNING in a single transaction
+    def create_orders(self, user_id: int, orders_data: list[OrderCreate]) -> list[Order]:
+        if not orders_data:
+            return []
+        rows = [
+            {"user_id": user_id, "total_amount": order_data.total_amount, "status": order_data.status}
+            for order_data in orders_data
+        ]
+        orders = self.db.scalars(insert(Order).returning(Order, sort_by_parameter_order=True), rows).all()
+        record_created(self.db, orders)
+        record_changes(self.db, [(order.user_id, order.order_date, None, order.status, order.total_amount) for order in orders])
+        self.db.commit()
+        return orders
+
+
     def get_order(self, order_id: int) -> Order | None:
         return self.db.query(Order).filter(Order.id == order_id).first()
 
 
-    def update_order(self, order_id: int, order_data: OrderUpdate) -> Order | None:
-        order = self.get_order(order_id)
-        if not order:
-            return None
-        if order_data.status is not None:
-            order.status = order_data.status
+    def get_order_owner(self, order_id: int) -> int | None:
+        return self.db.scalar(select(Order.user_id).where(Order.id == order_id))
+
+
+    # (user_id, updated_at, status) of an order, or None: enough to authorize and answer If-None-Match
+    def get_order_version(self, order_id: int):
+        return self.db.execute(select(Order.user_id, Order.updated_at, Order.status).where(Order.id == order_id)).first()
+
+
+    # Ownership is part of the statement: with `owner_id` set, only that user's order matches.
+    # A mutation that matches nothing is a single statement; None/False means the order is missing or not owned,
+    # and the caller tells those apart with get_order_owner on that path only.
+    @staticmethod
+    def _scope(order_id: int, owner_id: int | None) -> list:
+        conditions = [Order.id == order_id]
+        if owner_id is not None:
+            conditions.append(Order.user_id == owner_id)
+        return conditions
+
+
+    @property
+    def dialect(self) -> str:
+        return self.db.get_bind().dialect.name
+
+
+    # On PostgreSQL one statement: the UPDATE returns the status the order is changed from, and the summary
+    # and rollup updates run on its RETURNING in the same WITH. Elsewhere the order is read first, for that
+    # status, and the summary and rollups are updated after the UPDATE.
+    def update_order(self, order_id: int, order_data: OrderUpdate, owner_id: int | None = None) -> Order | None:
+        values = order_data.model_dump(exclude_none=True)
+        if not values:
+            statement = select(Order).where(*self._scope(order_id, owner_id))
+            order = self.db.scalars(statement.execution_options(populate_existing=True)).first()
+            self.db.commit()
+            return order
+        if self.dialect == "postgresql":
+            changed = self._update_cte(and_(*self._scope(order_id, owner_id)), values)
+            statement = select(aliased(Order, changed)).add_cte(*self._totals_ctes(changed))
+            order = self.db.scalars(statement.execution_options(populate_existing=True)).first()
+            self.db.commit()
+            return order
+        previous = self._lock_previous(and_(*self._scope(order_id, owner_id)))
+        order = None
+        if previous:
+            statement = update(Order).where(Order.id == order_id).values(**values).returning(Order)
+            order = self.db.scalars(statement.execution_options(populate_existing=True)).first()
+            record_status_changes(self.db, [(order.user_id, previous[0].status, order.status, order.total_amount)])
+            record_changes(self.db, [(order.user_id, order.order_date, previous[0].status, order.status, order.total_amount)])
         self.db.commit()
-        self.db.refresh(order)
         return order
 
 
-    def delete_order(self, order_id: int) -> bool:
-        order = self.get_order(order_id)
-        if not order:
-            return False
-        self.db.delete(order)
+    # UPDATE orders ... FROM the matching orders, locked by a sub-SELECT ... FOR UPDATE, as a CTE returning the
+    # updated orders with the status each had before (previous_status). PostgreSQL only.
+    @staticmethod
+    def _update_cte(condition, values: dict):
+        previous = select(Order.id, Order.status).where(condition).with_for_update().subquery("previous")
+        return (
+            update(ORDERS)
+            .where(ORDERS.c.id == previous.c.id)
+            .values(**values)
+            .returning(*ORDERS.c, previous.c.status.label("previous_status"))
+            .cte("changed")
+        )
+
+
+    # The user_order_summary and order_rollups updates for `changes` (see status_changes_update), as CTEs
+    @staticmethod
+    def _totals_ctes(changes) -> list:
+        return [status_changes_update(changes).cte("summary_changes"), changes_upsert(changes).cte("rollup_changes")]
+
+
+    # (id, user_id, status, total_amount, order_date) of the matching orders, locked until the end of the
+    # transaction (SQLite path: the lock is a no-op there, where writers are serialized anyway)
+    def _lock_previous(self, condition, limit: int | None = None) -> list:
+        statement = (
+            select(Order.id, Order.user_id, Order.status, Order.total_amount, Order.order_date)
+            .where(condition)
+            .order_by(Order.id)
+            .limit(limit)
+            .with_for_update()
+        )
+        return self.db.execute(statement).all()
+
+
+    # One statement on PostgreSQL, as for update_order: the summary and rollups are updated from the
+    # DELETE's RETURNING in the same WITH
+    def delete_order(self, order_id: int, owner_id: int | None = None) -> bool:
+        statement = delete(ORDERS).where(*self._scope(order_id, owner_id)).returning(*ORDERS.c)
+        if self.dialect == "postgresql":
+            deleted = statement.cte("deleted")
+            changes = select(
+                deleted.c.user_id,
+                deleted.c.order_date,
+                deleted.c.status.label("previous_status"),
+                cast(null(), ORDERS.c.status.type).label("status"),
+                deleted.c.total_amount,
+            ).subquery("changes")
+            statement = (
+                select(deleted.c.id)
+                .add_cte(deleted_update(deleted).cte("summary_changes"), changes_upsert(changes).cte("rollup_changes"))
+            )
+            found = self.db.execute(statement).first() is not None
+            self.db.commit()
+            return found
+        deleted = self.db.execute(statement).first()
+        if deleted is not None:
+            record_deleted(self.db, deleted)
+            record_changes(self.db, [(deleted.user_id, deleted.order_date, deleted.status, None, deleted.total_amount)])
+        self.db.commit()
+        return deleted is not None
+
+
+    # Move orders to `target_status` in chunks of `chunk_size` orders, one transaction each: on PostgreSQL one
+    # UPDATE ... RETURNING per chunk (with the summary and rollup updates, as in update_order), elsewhere a
+    # read of the chunk, the UPDATE and the summary and rollup updates. Orders are selected either by id or
+    # by filter; orders already in the target status are left untouched. Returns the ids that changed.
+    def bulk_update_status(
+        self,
+        target_status: OrderStatus,
+        order_ids: list[int] | None = None,
+        filters: OrderFilter | None = None,
+        chunk_size: int = settings.ORDER_BULK_CHUNK_SIZE,
+    ) -> list[int]:
+        updated_ids = []
+        if order_ids is not None:
+            unique_ids = sorted(set(order_ids))
+            for start in range(0, len(unique_ids), chunk_size):
+                chunk = unique_ids[start:start + chunk_size]
+                updated_ids.extend(self._update_status_chunk(target_status, Order.id.in_(chunk))[1])
+            return updated_ids
+
+        # Walk the filtered set in id order so each chunk starts after the last order selected for the
+        # previous one. Orders another transaction moves to the target status in between are skipped, not
+        # updated, so a chunk may change nothing; only an empty selection ends the walk.
+        conditions = [*filters.conditions(), Order.status != target_status]
+        last_id = 0
+        while True:
+            selected_ids, ids = self._update_status_chunk(target_status, and_(*conditions, Order.id > last_id), chunk_size)
+            if not selected_ids:
+                return updated_ids
+            updated_ids.extend(ids)
+            last_id = max(selected_ids)
+
+
+    # Update the orders matching `condition` (the first `limit` by id) that are not in `target_status` yet.
+    # Returns the ids selected and the ids updated: an order selected but changed to the target status by
+    # another transaction before it was locked is not updated.
+    def _update_status_chunk(self, target_status: OrderStatus, condition, limit: int | None = None) -> tuple[list[int], list[int]]:
+        if self.dialect == "postgresql":
+            chunk = select(Order.id).where(condition).order_by(Order.id).limit(limit).cte("chunk")
+            changed = self._update_cte(and_(Order.id.in_(select(chunk.c.id)), Order.status != target_status), {"status": target_status})
+            statement = (
+                select(chunk.c.id, changed.c.id.label("updated_id"))
+                .select_from(chunk.outerjoin(changed, chunk.c.id == changed.c.id))
+                .add_cte(*self._totals_ctes(changed))
+                .order_by(chunk.c.id)
+            )
+            rows = self.db.execute(statement).all()
+            self.db.commit()
+            return [row.id for row in rows], [row.updated_id for row in rows if row.updated_id is not None]
+        selected = self._lock_previous(condition, limit)
+        previous = [row for row in selected if row.status != target_status]
+        ids = [row.id for row in previous]
+        if ids:
+            statement = (
+                update(Order)
+                .where(Order.id.in_(ids))
+                .values(status=target_status)
+                .execution_options(synchronize_session=False)
+            )
+            self.db.execute(statement)
+            record_status_changes(self.db, [(row.user_id, row.status, target_status, row.total_amount) for row in previous])
+            record_changes(self.db, [(row.user_id, row.order_date, row.status, target_status, row.total_amount) for row in previous])
         self.db.commit()
-        return True
+        return [row.id for row in selected], ids
+
+
+    # With `columns`, rows of just those columns are returned instead of Order objects
+    def list_all_orders(self, page: PageRequest, filters: OrderFilter = OrderFilter(), columns: list | None = None) -> tuple[list, str | None]:
+        query = self.db.query(*(columns or [Order])).filter(*filters.conditions())
+        return paginate(query, Order.id, page)
+
+
+    def list_orders_by_user(self, user_id: int, page: PageRequest, filters: OrderFilter = OrderFilter(), columns: list | None = None) -> tuple[list, str | None]:
+        query = self.db.query(*(columns or [Order])).filter(Order.user_id == user_id, *filters.conditions())
+        return paginate(query, Order.id, page)
+
+
+    # Plain row tuples for bulk export, ordered by id
+    @staticmethod
+    def export_statement(filters: OrderFilter, batch_size: int = 1000):
+        return (
+            select(*EXPORT_COLUMNS)
+            .where(*filters.conditions())
+            .order_by(Order.id)
+            .execution_options(yield_per=batch_size)
+        )
+
+
+    # Stream export rows in batches. yield_per keeps a server-side cursor open and fetches
+    # `batch_size` rows at a time, so memory stays flat regardless of the result size.
+    def iter_order_batches_for_export(self, filters: OrderFilter, batch_size: int = 1000) -> Iterator[list]:
+        result = self.db.execute(self.export_statement(filters, batch_size))
+        yield from result.partitions()
 
 
-    def list_all_orders(self) -> list[Order]:
-        return self.db.query(Order).all()
+class AsyncOrderService(AsyncService):
+    service_class = OrderService
 
 
-    def list_orders_by_user(self, user_id: int) -> list[Order]:
-        return self.db.query(Order).filter(Order.user_id == user_id).all()
\ No newline at end of file
+    # Async counterpart of iter_order_batches_for_export (needs an AsyncSession)
+    async def iter_order_batches_for_export(self, filters: OrderFilter, batch_size: int = 1000) -> AsyncIterator[list]:
+        result = await self.db.stream(OrderService.export_statement(filters, batch_size))
+        async for batch in result.partitions():
+            yield batch
@@ -0,0 +1,151 @@
+import re
+from datetime import datetime
+from sqlalchemy import column, func, insert, literal, select, table, text
+from sqlalchemy.orm import Session
+from database.models.orders import Order
+from services.order_summary import ARCHIVED, status_totals
+
+# On PostgreSQL the migrations partition orders by range of order_date: orders_pYYYY_MM holds the orders
+# of one month, orders_default the ones no month partition covers. Archived months are detached and
+# renamed orders_archived_pYYYY_MM; they stay in the database, outside of orders.
+DEFAULT_PARTITION = "orders_default"
+_BOUNDS = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"orders_p{month:%Y_%m}"
+
+
+def archived_name(month: datetime) -> str:
+    return f"orders_archived_p{month:%Y_%m}"
+
+
+# A table with the columns of orders, for statements on one partition
+def partition_table(name: str):
+    return table(name, *(column(orders_column.name, orders_column.type) for orders_column in Order.__table__.c))
+
+
+class OrderPartitionService:
+    def __init__(self, db: Session):
+        self.db = db
+
+
+    # True when orders is a partitioned table (PostgreSQL, migrated); everything below is a no-op otherwise
+    def is_partitioned(self) -> bool:
+        if self.db.get_bind().dialect.name != "postgresql":
+            return False
+        return self.db.scalar(text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('orders'))"))
+
+
+    # The month partitions attached to orders, as (name, start, end), oldest first
+    def partitions(self) -> list[tuple[str, datetime, datetime]]:
+        rows = self.db.execute(text("""
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+            FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = 'orders'::regclass
+        """))
+        partitions = []
+        for name, bound in rows:
+            match = _BOUNDS.search(bound)
+            if match is not None:
+                partitions.append((name, datetime.fromisoformat(match[1]), datetime.fromisoformat(match[2])))
+        return sorted(partitions, key=lambda partition: partition[1])
+
+
+    # First day of the current month by the database clock, the one order_date defaults to
+    def current_month(self) -> datetime:
+        return self.db.scalar(text("SELECT date_trunc('month', localtimestamp)::timestamp"))
+
+
+    # Create the partitions of the current month and `months_ahead` months after it (and of every month since
+    # `date_from`), and of every month with orders in the default partition (moved to their month's
+    # partition). One transaction per partition; returns the names created. With every partition in place
+    # this is two catalog queries and an index-less scan of the (empty) default partition.
+    def ensure(self, months_ahead: int, date_from: datetime | None = None) -> list[str]:
+        if not self.is_partitioned():
+            return []
+        existing = {start for _, start, _ in self.partitions()}
+        current = self.current_month()
+        first = min(current, date_from.replace(day=1, hour=0, minute=0, second=0, microsecond=0)) if date_from else current
+        months, month = set(), first
+        while month <= add_months(current, months_ahead):
+            months.add(month)
+            month = add_months(month, 1)
+        months.update(self.db.scalars(text(f"SELECT DISTINCT date_trunc('month', order_date) FROM {DEFAULT_PARTITION}")))
+        self.db.rollback()
+        created = []
+        for month in sorted(months - existing):
+            self._create_partition(month)
+            created.append(partition_name(month))
+        return created
+
+
+    # ATTACH PARTITION checks that the default partition has no rows of the month left: the lock keeps
+    # orders from being written there until then (other partitions are not affected)
+    def _create_partition(self, month: datetime) -> None:
+        name, end = partition_name(month), add_months(month, 1)
+        self.db.execute(text(f"LOCK TABLE {DEFAULT_PARTITION} IN ACCESS EXCLUSIVE MODE"))
+        self.db.execute(text(f"CREATE TABLE {name} (LIKE orders INCLUDING DEFAULTS)"))
+        self.db.execute(
+            text(f"""
+                WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE order_date >= :start AND order_date < :end RETURNING *)
+                INSERT INTO {name} SELECT * FROM moved
+            """),
+            {"start": month, "end": end},
+        )
+        self.db.execute(text(f"ALTER TABLE orders ATTACH PARTITION {name} FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"))
+        self.db.commit()
+
+
+    # Detach the month partitions that ended at least `older_than_months` months before the current month and
+    # hold no pending orders (completed and cancelled orders do not change any more). Returns
+    # (partition, outcome) for every partition considered; with dry_run nothing is changed.
+    def archive(self, older_than_months: int, dry_run: bool = False) -> list[tuple[str, str]]:
+        if not self.is_partitioned():
+            return []
+        cutoff = add_months(self.current_month(), -older_than_months)
+        outcomes = []
+        for name, start, end in self.partitions():
+            if end > cutoff:
+                break
+            if dry_run:
+                outcomes.append((name, "has pending orders" if self._has_pending(name) else f"would be archived as {archived_name(start)}"))
+                self.db.rollback()
+            elif self._archive_partition(name, start):
+                outcomes.append((name, f"archived as {archived_name(start)}"))
+            else:
+                outcomes.append((name, "has pending orders"))
+        return outcomes
+
+
+    def _has_pending(self, name: str) -> bool:
+        partition = partition_table(name)
+        return self.db.scalar(select(select(partition.c.id).where(partition.c.status == "pending").exists()))
+
+
+    # Detach a month in one transaction that records its per-user totals in archived_order_totals. The
+    # summaries and rollups keep counting the month's orders; rebuilding the summary adds the recorded
+    # totals, and the rollups of the month are left out of backfill and verify. Order changes wait on the
+    # table lock meanwhile (reads do not, until the short DETACH), so the recorded totals are final.
+    def _archive_partition(self, name: str, start: datetime) -> bool:
+        self.db.execute(text("LOCK TABLE orders IN SHARE MODE"))
+        if self._has_pending(name):
+            self.db.rollback()
+            return False
+        partition = partition_table(name)
+        totals = (
+            select(literal(start).label("month"), partition.c.user_id, *status_totals(ARCHIVED, partition), func.max(partition.c.order_date).label("last_order_at"))
+            .group_by(partition.c.user_id)
+        )
+        self.db.execute(insert(ARCHIVED).from_select([selected.name for selected in totals.selected_columns], totals))
+        self.db.execute(text(f"ALTER TABLE orders DETACH PARTITION {name}"))
+        self.db.execute(text(f"ALTER TABLE {name} RENAME TO {archived_name(start)}"))
+        # Archived orders take no new ids, and orders_id_seq stays droppable with orders
+        self.db.execute(text(f"ALTER TABLE {archived_name(start)} ALTER COLUMN id DROP DEFAULT"))
+        self.db.commit()
+        return True
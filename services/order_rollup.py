@@ -0,0 +1,214 @@
+import math
+from datetime import datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import TIMESTAMP, delete, func, insert, literal, literal_column, select, text, union_all
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+from config.settings import OrderStatus, RollupGranularity, settings
+from database.models.order_rollups import OrderRollup
+from database.models.orders import Order
+from services.base import AsyncService
+from services.order_summary import AMOUNT_TOLERANCE, ARCHIVED, amount_column, count_column, status_deltas, status_totals, upsert, zero
+
+ROLLUP = OrderRollup.__table__
+# The per-status columns, which order changes add to and subtract from
+TOTAL_COLUMNS = [column for status in OrderStatus for column in (count_column(status, ROLLUP), amount_column(status, ROLLUP))]
+BUCKET_SIZES = {RollupGranularity.hour: timedelta(hours=1), RollupGranularity.day: timedelta(days=1)}
+
+
+# Start of the bucket holding `moment`
+def bucket_start(granularity: RollupGranularity, moment: datetime) -> datetime:
+    if granularity == RollupGranularity.day:
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+# Buckets starting in [date_from, date_to)
+def bucket_count(granularity: RollupGranularity, date_from: datetime, date_to: datetime) -> int:
+    return max(0, math.ceil((date_to - bucket_start(granularity, date_from)) / BUCKET_SIZES[granularity]))
+
+
+# bucket_start in SQL. SQLite keeps timestamps as text, in the format SQLAlchemy writes them; the
+# buckets computed here then compare equal to the ones written from Python.
+def bucket_start_sql(dialect: str, granularity: RollupGranularity, column):
+    # Literals, not parameters: PostgreSQL matches the GROUP BY expression to the selected one textually
+    if dialect == "postgresql":
+        return func.date_trunc(literal_column(f"'{granularity.value}'"), column, type_=TIMESTAMP)
+    pattern = "%Y-%m-%d 00:00:00.000000" if granularity == RollupGranularity.day else "%Y-%m-%d %H:00:00.000000"
+    return func.strftime(literal_column(f"'{pattern}'"), column, type_=TIMESTAMP)
+
+
+# Order changes, as (user_id, order_date, previous status, new status, total_amount), with None as the
+# previous status of a new order and as the new status of a deleted one: one INSERT ... ON CONFLICT
+# DO UPDATE adding to the hour and day rows of the user's shard, in key order
+def record_changes(db: Session, changes) -> None:
+    rows = {}
+    for user_id, order_date, previous, current, amount in changes:
+        if previous == current or order_date is None:
+            continue
+        amount = Decimal(str(amount))
+        shard = user_id % settings.ORDER_ROLLUP_SHARDS
+        for granularity in RollupGranularity:
+            key = (granularity.value, bucket_start(granularity, order_date), shard)
+            row = rows.setdefault(key, {
+                "granularity": key[0], "bucket_start": key[1], "shard": shard,
+                **{column.name: zero(column) for column in TOTAL_COLUMNS},
+            })
+            if previous is not None:
+                row[count_column(previous, ROLLUP).name] -= 1
+                row[amount_column(previous, ROLLUP).name] -= amount
+            if current is not None:
+                row[count_column(current, ROLLUP).name] += 1
+                row[amount_column(current, ROLLUP).name] += amount
+    if not rows:
+        return
+    statement = upsert(db, ROLLUP).values([rows[key] for key in sorted(rows)])
+    statement = statement.on_conflict_do_update(
+        index_elements=[ROLLUP.c.granularity, ROLLUP.c.bucket_start, ROLLUP.c.shard],
+        set_={column.name: column + statement.excluded[column.name] for column in TOTAL_COLUMNS},
+    )
+    db.execute(statement)
+
+
+# First day of the month of `column` in SQL, as ArchivedOrderTotals.month (see bucket_start_sql)
+def month_start_sql(dialect: str, column):
+    if dialect == "postgresql":
+        return func.date_trunc(literal_column("'month'"), column, type_=TIMESTAMP)
+    return func.strftime(literal_column("'%Y-%m-01 00:00:00.000000'"), column, type_=TIMESTAMP)
+
+
+# record_changes in SQL, for `changes`, a selectable of changed orders (user_id, order_date, previous_status,
+# status, total_amount): one INSERT ... SELECT ... ON CONFLICT DO UPDATE, run as a CTE of the statement
+# changing the orders (PostgreSQL), so the rollups move in the same statement
+def changes_upsert(changes):
+    # Literal, like the bucket, so the grouped expression matches the selected one
+    shard = (changes.c.user_id % literal_column(str(settings.ORDER_ROLLUP_SHARDS))).label("shard")
+    sources = []
+    for granularity in RollupGranularity:
+        bucket = bucket_start_sql("postgresql", granularity, changes.c.order_date).label("bucket_start")
+        sources.append(
+            select(literal(granularity.value).label("granularity"), bucket, shard, *status_deltas(changes, ROLLUP))
+            .where(changes.c.previous_status.is_distinct_from(changes.c.status), changes.c.order_date.is_not(None))
+            .group_by(bucket, shard)
+        )
+    source = union_all(*sources)
+    statement = postgresql.insert(ROLLUP).from_select([column.name for column in source.selected_columns], source)
+    return statement.on_conflict_do_update(
+        index_elements=[ROLLUP.c.granularity, ROLLUP.c.bucket_start, ROLLUP.c.shard],
+        set_={column.name: column + statement.excluded[column.name] for column in TOTAL_COLUMNS},
+    )
+
+
+# The buckets of one granularity computed from the orders table (all in shard 0), optionally for the
+# orders dated in [date_from, date_to)
+def rollups_from_orders(dialect: str, granularity: RollupGranularity, date_from: datetime | None = None, date_to: datetime | None = None):
+    bucket = bucket_start_sql(dialect, granularity, Order.order_date).label("bucket_start")
+    statement = (
+        select(literal(granularity.value).label("granularity"), bucket, literal(0).label("shard"), *status_totals(ROLLUP))
+        .where(Order.order_date.is_not(None))
+        .group_by(bucket)
+    )
+    if date_from is not None:
+        statement = statement.where(Order.order_date >= date_from)
+    if date_to is not None:
+        statement = statement.where(Order.order_date < date_to)
+    return statement
+
+
+class OrderRollupService:
+    def __init__(self, db: Session):
+        self.db = db
+
+
+    @property
+    def dialect(self) -> str:
+        return self.db.get_bind().dialect.name
+
+
+    # Buckets of the months still in orders. The buckets of archived months keep their totals: their orders
+    # are out of the orders table, and backfill and verify leave them alone.
+    def _attached_buckets(self):
+        return month_start_sql(self.dialect, ROLLUP.c.bucket_start).not_in(select(ARCHIVED.c.month).distinct())
+
+
+    # Totals of every bucket starting in [date_from, date_to), empty ones included, from one range scan of
+    # the primary key: a year of daily buckets reads at most 365 rows per shard
+    def get_buckets(self, granularity: RollupGranularity, date_from: datetime, date_to: datetime) -> list[dict]:
+        start = bucket_start(granularity, date_from)
+        statement = (
+            select(ROLLUP.c.bucket_start, *(func.sum(column).label(column.name) for column in TOTAL_COLUMNS))
+            .where(ROLLUP.c.granularity == granularity.value, ROLLUP.c.bucket_start >= start, ROLLUP.c.bucket_start < date_to)
+            .group_by(ROLLUP.c.bucket_start)
+        )
+        # (count, amount) per status in OrderStatus order, as in TOTAL_COLUMNS
+        totals = {row[0]: row[1:] for row in self.db.execute(statement)}
+        empty = (0,) * len(TOTAL_COLUMNS)
+        statuses = [status.value for status in OrderStatus]
+        buckets = []
+        for index in range(bucket_count(granularity, date_from, date_to)):
+            moment = start + index * BUCKET_SIZES[granularity]
+            row = totals.get(moment, empty)
+            by_status = {status: {"count": row[2 * i], "total_amount": row[2 * i + 1]} for i, status in enumerate(statuses)}
+            buckets.append({
+                "bucket_start": moment,
+                "order_count": sum(row[0::2]),
+                "total_amount": sum(row[1::2]),
+                "by_status": by_status,
+            })
+        return buckets
+
+
+    # Recompute the buckets of the orders dated in [date_from, date_to), widened to whole days (all orders
+    # by default), from the orders table in one transaction; archived months are skipped. On PostgreSQL the
+    # table lock holds back concurrent order changes' rollup updates until the recomputed rows are committed.
+    def backfill(self, date_from: datetime | None = None, date_to: datetime | None = None) -> int:
+        if self.dialect == "postgresql":
+            self.db.execute(text("LOCK TABLE order_rollups IN SHARE ROW EXCLUSIVE MODE"))
+        day = RollupGranularity.day
+        if date_from is not None:
+            date_from = bucket_start(day, date_from)
+        if date_to is not None and date_to != bucket_start(day, date_to):
+            date_to = bucket_start(day, date_to) + BUCKET_SIZES[day]
+        statement = delete(ROLLUP).where(self._attached_buckets())
+        if date_from is not None:
+            statement = statement.where(ROLLUP.c.bucket_start >= date_from)
+        if date_to is not None:
+            statement = statement.where(ROLLUP.c.bucket_start < date_to)
+        self.db.execute(statement)
+        rows = 0
+        for granularity in RollupGranularity:
+            source = rollups_from_orders(self.dialect, granularity, date_from, date_to)
+            rows += self.db.execute(insert(ROLLUP).from_select([column.name for column in source.selected_columns], source)).rowcount
+        self.db.commit()
+        return rows
+
+
+    # Buckets of the months still in orders whose totals differ from the orders table, as (granularity,
+    # bucket_start, column, expected, stored). One statement, so the comparison sees a single snapshot of both tables.
+    def verify(self) -> list[tuple]:
+        names = [column.name for column in TOTAL_COLUMNS]
+        sources = [rollups_from_orders(self.dialect, granularity).subquery() for granularity in RollupGranularity]
+        expected = [
+            select(literal("expected").label("source"), source.c.granularity, source.c.bucket_start, *(source.c[name] for name in names))
+            for source in sources
+        ]
+        stored = (
+            select(literal("stored").label("source"), ROLLUP.c.granularity, ROLLUP.c.bucket_start, *(func.sum(column).label(column.name) for column in TOTAL_COLUMNS))
+            .where(self._attached_buckets())
+            .group_by(ROLLUP.c.granularity, ROLLUP.c.bucket_start)
+        )
+        totals = {"expected": {}, "stored": {}}
+        for row in self.db.execute(union_all(*expected, stored)):
+            totals[row.source][(row.granularity, row.bucket_start)] = row[3:]
+        mismatches = []
+        for key in sorted(totals["expected"].keys() | totals["stored"].keys()):
+            want, have = totals["expected"].get(key), totals["stored"].get(key)
+            for index, name in enumerate(names):
+                values = (want[index] if want else 0) or 0, (have[index] if have else 0) or 0
+                if abs(values[0] - values[1]) > AMOUNT_TOLERANCE:
+                    mismatches.append((*key, name, *values))
+        return mismatches
+
+
+class AsyncOrderRollupService(AsyncService):
+    service_class = OrderRollupService
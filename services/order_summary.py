@@ -0,0 +1,265 @@
+from collections import defaultdict
+from decimal import Decimal
+from sqlalchemy import bindparam, case, delete, func, insert, or_, select, text, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from config.settings import OrderStatus
+from database.models.archived_order_totals import ArchivedOrderTotals
+from database.models.order_summaries import UserOrderSummary
+from database.models.orders import Order
+from services.base import AsyncService
+
+SUMMARY = UserOrderSummary.__table__
+ARCHIVED = ArchivedOrderTotals.__table__
+
+
+# Order totals tables have a <status>_count and a <status>_amount column per OrderStatus
+def count_column(status: OrderStatus, table=SUMMARY):
+    return table.c[f"{OrderStatus(status).value}_count"]
+
+
+def amount_column(status: OrderStatus, table=SUMMARY):
+    return table.c[f"{OrderStatus(status).value}_amount"]
+
+
+# The per-status columns, which order changes add to and subtract from
+TOTAL_COLUMNS = [column for status in OrderStatus for column in (count_column(status), amount_column(status))]
+
+
+# Amounts are exact on PostgreSQL; SQLite sums them as floats, in another order than the incremental updates
+AMOUNT_TOLERANCE = Decimal("0.000001")
+
+
+def zero(column):
+    return 0 if column.name.endswith("_count") else Decimal(0)
+
+
+# INSERT ... ON CONFLICT of the session's dialect
+def upsert(db: Session, table):
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert(table)
+
+
+# New orders (objects or rows with user_id, status, total_amount, order_date): one INSERT ... ON CONFLICT
+# DO UPDATE adding to each user's row, or creating it
+def record_created(db: Session, orders) -> None:
+    rows = {}
+    for order in orders:
+        row = rows.setdefault(order.user_id, {"user_id": order.user_id, "last_order_at": None, **{column.name: zero(column) for column in TOTAL_COLUMNS}})
+        row[count_column(order.status).name] += 1
+        row[amount_column(order.status).name] += Decimal(str(order.total_amount))
+        if row["last_order_at"] is None or (order.order_date is not None and order.order_date > row["last_order_at"]):
+            row["last_order_at"] = order.order_date
+    if not rows:
+        return
+    statement = upsert(db, SUMMARY).values([rows[user_id] for user_id in sorted(rows)])
+    excluded = statement.excluded
+    later = or_(SUMMARY.c.last_order_at.is_(None), excluded.last_order_at > SUMMARY.c.last_order_at)
+    statement = statement.on_conflict_do_update(
+        index_elements=[SUMMARY.c.user_id],
+        set_={
+            **{column.name: column + excluded[column.name] for column in TOTAL_COLUMNS},
+            "last_order_at": case((later, excluded.last_order_at), else_=SUMMARY.c.last_order_at),
+        },
+    )
+    db.execute(statement)
+
+
+# Status changes, as (user_id, previous status, new status, total_amount): one UPDATE per user, sent as a
+# single executemany in user id order (concurrent bulk changes lock the rows in the same order)
+def record_status_changes(db: Session, changes) -> None:
+    deltas = defaultdict(lambda: {column.name: zero(column) for column in TOTAL_COLUMNS})
+    for user_id, previous, current, amount in changes:
+        if previous == current:
+            continue
+        delta = deltas[user_id]
+        delta[count_column(previous).name] -= 1
+        delta[amount_column(previous).name] -= amount
+        delta[count_column(current).name] += 1
+        delta[amount_column(current).name] += amount
+    if not deltas:
+        return
+    statement = (
+        update(SUMMARY)
+        .where(SUMMARY.c.user_id == bindparam("summary_user_id"))
+        .values({column.name: column + bindparam(f"delta_{column.name}", type_=column.type) for column in TOTAL_COLUMNS})
+    )
+    db.execute(statement, [
+        {"summary_user_id": user_id, **{f"delta_{name}": value for name, value in deltas[user_id].items()}}
+        for user_id in sorted(deltas)
+    ])
+
+
+# A deleted order (row with user_id, status, total_amount, order_date), after its DELETE. Only when it was
+# the user's latest order is the last order date looked up again, among the user's remaining orders and
+# archived months.
+def record_deleted(db: Session, order) -> None:
+    dates = union_all(
+        select(Order.order_date).where(Order.user_id == order.user_id),
+        select(ARCHIVED.c.last_order_at).where(ARCHIVED.c.user_id == order.user_id),
+    ).subquery("dates")
+    latest = select(func.max(dates.c.order_date)).scalar_subquery()
+    db.execute(
+        update(SUMMARY)
+        .where(SUMMARY.c.user_id == order.user_id)
+        .values({
+            count_column(order.status): count_column(order.status) - 1,
+            amount_column(order.status): amount_column(order.status) - order.total_amount,
+            SUMMARY.c.last_order_at: case((SUMMARY.c.last_order_at <= order.order_date, latest), else_=SUMMARY.c.last_order_at),
+        })
+    )
+
+
+# record_status_changes in SQL, for `changes`, a selectable of changed orders (user_id, previous_status, status,
+# total_amount): one UPDATE ... FROM the per-user deltas, run as a CTE of the statement changing the orders
+# (PostgreSQL), so the summary moves in the same statement
+def status_changes_update(changes):
+    deltas = (
+        select(changes.c.user_id, *status_deltas(changes))
+        .where(changes.c.previous_status.is_distinct_from(changes.c.status))
+        .group_by(changes.c.user_id)
+        .subquery("deltas")
+    )
+    return (
+        update(SUMMARY)
+        .where(SUMMARY.c.user_id == deltas.c.user_id)
+        .values({column.name: column + deltas.c[column.name] for column in TOTAL_COLUMNS})
+    )
+
+
+# record_deleted in SQL, for `deleted`, the rows returned by a DELETE ... RETURNING run in the same
+# statement (PostgreSQL). That statement still sees the deleted order, so it is left out of the lookup.
+def deleted_update(deleted):
+    remaining = (
+        select(func.max(Order.order_date))
+        .where(Order.user_id == deleted.c.user_id, Order.id != deleted.c.id)
+        .correlate(deleted)
+        .scalar_subquery()
+    )
+    archived = select(func.max(ARCHIVED.c.last_order_at)).where(ARCHIVED.c.user_id == deleted.c.user_id).correlate(deleted).scalar_subquery()
+    # greatest() ignores NULLs on PostgreSQL
+    latest = func.greatest(remaining, archived)
+    values = {}
+    for status in OrderStatus:
+        matches = deleted.c.status == status
+        values[count_column(status)] = count_column(status) - case((matches, 1), else_=0)
+        values[amount_column(status)] = amount_column(status) - case((matches, deleted.c.total_amount), else_=0)
+    values[SUMMARY.c.last_order_at] = case((SUMMARY.c.last_order_at <= deleted.c.order_date, latest), else_=SUMMARY.c.last_order_at)
+    return update(SUMMARY).where(SUMMARY.c.user_id == deleted.c.user_id).values(values)
+
+
+# Aggregates of the selected orders (of `orders`, a table with the columns of Order) labelled as the
+# per-status columns of `table`
+def status_totals(table=SUMMARY, orders=Order.__table__) -> list:
+    columns = []
+    for status in OrderStatus:
+        columns.append(func.sum(case((orders.c.status == status, 1), else_=0)).label(count_column(status, table).name))
+        columns.append(func.sum(case((orders.c.status == status, orders.c.total_amount), else_=0)).label(amount_column(status, table).name))
+    return columns
+
+
+# Net change per status of the orders of `changes` (previous_status and status, None for a created or deleted
+# order, and total_amount), labelled as the per-status columns of `table`
+def status_deltas(changes, table=SUMMARY) -> list:
+    columns = []
+    for status in OrderStatus:
+        added, removed = changes.c.status == status, changes.c.previous_status == status
+        amount = changes.c.total_amount
+        columns.append(func.sum(case((added, 1), else_=0) - case((removed, 1), else_=0)).label(count_column(status, table).name))
+        columns.append(func.sum(case((added, amount), else_=0) - case((removed, amount), else_=0)).label(amount_column(status, table).name))
+    return columns
+
+
+# The summary rows computed from the orders table and the totals of the archived months, for all users or one
+def summary_from_orders(user_id: int | None = None):
+    names = [column.name for column in TOTAL_COLUMNS]
+    live = select(Order.user_id, *status_totals(), func.max(Order.order_date).label("last_order_at")).group_by(Order.user_id)
+    archived = select(ARCHIVED.c.user_id, *(ARCHIVED.c[name] for name in names), ARCHIVED.c.last_order_at)
+    if user_id is not None:
+        live = live.where(Order.user_id == user_id)
+        archived = archived.where(ARCHIVED.c.user_id == user_id)
+    totals = union_all(live, archived).subquery("totals")
+    return (
+        select(totals.c.user_id, *(func.sum(totals.c[name]).label(name) for name in names), func.max(totals.c.last_order_at).label("last_order_at"))
+        .group_by(totals.c.user_id)
+    )
+
+
+class OrderSummaryService:
+    def __init__(self, db: Session):
+        self.db = db
+
+
+    # Totals of a user's orders from their summary row: one primary key lookup, however many orders
+    def get_summary(self, user_id: int) -> dict:
+        row = self.db.execute(select(SUMMARY).where(SUMMARY.c.user_id == user_id)).first()
+        by_status = {
+            status.value: {
+                "count": getattr(row, count_column(status).name) if row else 0,
+                "total_amount": getattr(row, amount_column(status).name) if row else 0,
+            }
+            for status in OrderStatus
+        }
+        return {
+            "user_id": user_id,
+            "order_count": sum(totals["count"] for totals in by_status.values()),
+            "total_amount": sum(totals["total_amount"] for totals in by_status.values()),
+            "last_order_at": row.last_order_at if row else None,
+            "by_status": by_status,
+        }
+
+
+    # Recompute the summary (of every user, or one) from the orders table in one transaction. On PostgreSQL
+    # the table lock holds back concurrent order changes' summary updates until the rebuilt rows are
+    # committed; they then apply on top of totals that do not include them yet.
+    def rebuild(self, user_id: int | None = None) -> int:
+        if self.db.get_bind().dialect.name == "postgresql":
+            self.db.execute(text("LOCK TABLE user_order_summary IN SHARE ROW EXCLUSIVE MODE"))
+        statement = delete(SUMMARY)
+        if user_id is not None:
+            statement = statement.where(SUMMARY.c.user_id == user_id)
+        self.db.execute(statement)
+        source = summary_from_orders(user_id)
+        rows = self.db.execute(insert(SUMMARY).from_select([column.name for column in source.selected_columns], source)).rowcount
+        self.db.commit()
+        return rows
+
+
+    # Users whose summary row differs from their orders, as (user_id, column, expected, stored); a missing
+    # row counts as zeros. One statement, so the comparison sees a single snapshot of both tables.
+    def verify(self) -> list[tuple]:
+        expected = summary_from_orders().subquery("expected")
+        stored = SUMMARY.alias("stored")
+        names = [column.name for column in TOTAL_COLUMNS]
+        differs = [
+            func.abs(func.coalesce(expected.c[name], 0) - func.coalesce(stored.c[name], 0)) > AMOUNT_TOLERANCE
+            for name in names
+        ]
+        differs.append(expected.c.last_order_at.is_distinct_from(stored.c.last_order_at))
+        statement = (
+            select(
+                func.coalesce(expected.c.user_id, stored.c.user_id).label("user_id"),
+                *(expected.c[name] for name in [*names, "last_order_at"]),
+                *(stored.c[name] for name in [*names, "last_order_at"]),
+            )
+            .select_from(expected.join(stored, expected.c.user_id == stored.c.user_id, full=True))
+            .where(or_(*differs))
+            .order_by("user_id")
+        )
+        mismatches = []
+        for row in self.db.execute(statement):
+            user_id, values = row[0], row[1:]
+            for index, name in enumerate([*names, "last_order_at"]):
+                want, have = values[index], values[index + len(names) + 1]
+                if name != "last_order_at":
+                    want, have = want or 0, have or 0
+                    if abs(want - have) <= AMOUNT_TOLERANCE:
+                        continue
+                elif want == have:
+                    continue
+                mismatches.append((user_id, name, want, have))
+        return mismatches
+
+
+class AsyncOrderSummaryService(AsyncService):
+    service_class = OrderSummaryService
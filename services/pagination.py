@@ -0,0 +1,54 @@
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+
+
+# Keyset page request: `after_id` is the last id of the previous page (None for the first page).
+# Lists ordered by relevance first (search) also carry the last row's rank in `after_rank`.
+@dataclass(frozen=True)
+class PageRequest:
+    limit: int
+    after_id: int | None = None
+    after_rank: int | None = None
+
+
+# Cursors are opaque to clients: url-safe base64 of a small JSON object
+def encode_cursor(last_id: int, rank: int | None = None) -> str:
+    data = {"id": last_id} if rank is None else {"id": last_id, "rank": rank}
+    raw = json.dumps(data, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _decode(cursor: str, *keys: str) -> list[int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = [data[key] for key in keys]
+    except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError):
+        raise ValueError("Invalid cursor")
+    if any(not isinstance(value, int) or isinstance(value, bool) for value in values):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def decode_cursor(cursor: str) -> int:
+    return _decode(cursor, "id")[0]
+
+
+# (rank, id) of a relevance-ordered cursor
+def decode_ranked_cursor(cursor: str) -> tuple[int, int]:
+    rank, last_id = _decode(cursor, "rank", "id")
+    return rank, last_id
+
+
+# Apply keyset pagination ordered by `id_column` to a query.
+# Fetches one extra row to know whether a next page exists, so at most limit + 1 rows are loaded.
+def paginate(query, id_column, page: PageRequest) -> tuple[list, str | None]:
+    if page.after_id is not None:
+        query = query.filter(id_column > page.after_id)
+    rows = query.order_by(id_column).limit(page.limit + 1).all()
+    if len(rows) <= page.limit:
+        return rows, None
+    rows = rows[:page.limit]
+    return rows, encode_cursor(rows[-1].id)
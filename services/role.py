@@ -1,7 +1,72 @@
 from sqlalchemy.orm import Session
+from cache import invalidation_channel
 from database.models.roles import Role
 from database.models.privileges import Privilege
 from database.models.role_privileges import RolePrivilege
+from services.base import AsyncService
+from services.user import cache_principal, publish_principal_change
+
+# Privileges checked by the routers, with their descriptions
+PRIVILEGES = {
+    "orders:read_all": "Read any user's orders",
+    "orders:write_all": "Update or delete any user's orders",
+    "analytics:read": "Read order analytics (counts and revenue over time)",
+    "users:create": "Create users",
+    "users:read_all": "Read any user's profile",
+    "users:write_all": "Update any user's profile",
+    "users:delete": "Delete users",
+}
+
+# Roles seeded on startup, and the privileges granted to them when a privilege is first created
+DEFAULT_ROLE_PRIVILEGES = {
+    "admin": list(PRIVILEGES),
+    "customer": [],
+}
+
+PRIVILEGES_TOPIC = "privileges"
+
+
+# Role -> privilege bitset matrix, compiled from roles/privileges/role_privileges.
+# Each privilege name gets a bit; each role name maps to the OR of its privileges' bits,
+# so a check is two dict lookups and an AND with no queries.
+class PrivilegeMatrix:
+    def __init__(self):
+        # (privilege name -> bit, role name -> bitset), swapped as one object on reload
+        self._matrix: tuple[dict[str, int], dict[str, int]] = ({}, {})
+        self._loaded = False
+
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+
+    def load(self, db: Session) -> None:
+        names = [name for (name,) in db.query(Privilege.name).order_by(Privilege.id)]
+        bits = {name: 1 << index for index, name in enumerate(names)}
+        roles = {name: 0 for (name,) in db.query(Role.name)}
+        grants = db.query(Role.name, Privilege.name).join(RolePrivilege, RolePrivilege.role_id == Role.id).join(Privilege, Privilege.id == RolePrivilege.privilege_id)
+        for role_name, privilege_name in grants:
+            roles[role_name] |= bits[privilege_name]
+        self._matrix = (bits, roles)
+        self._loaded = True
+
+
+    # Mark stale; the next request that needs the matrix reloads it
+    def invalidate(self) -> None:
+        self._loaded = False
+
+
+    def has(self, role: str | None, privilege: str) -> bool:
+        bits, roles = self._matrix
+        return bool(roles.get(role, 0) & bits.get(privilege, 0))
+
+
+privilege_matrix = PrivilegeMatrix()
+
+# Another worker changed role grants
+invalidation_channel.subscribe(PRIVILEGES_TOPIC, lambda key: privilege_matrix.invalidate())
+
 
 class RoleService:
     def __init__(self, db: Session):
@@ -10,18 +75,50 @@ class RoleService:
 
     def assign_role_to_user(self, user, role_name: str) -> None:
         user.role = role_name
+        # The cached principal carries the role, so replace it everywhere
+        publish_principal_change(self.db, user.id)
         self.db.commit()
+        cache_principal(user)
 
 
     def add_privilege_to_role(self, role_id: int, privilege_id: int) -> None:
         rp = RolePrivilege(role_id=role_id, privilege_id=privilege_id)
         self.db.add(rp)
+        # Have the other workers recompile on their next check once this commits, and recompile here
+        invalidation_channel.publish(PRIVILEGES_TOPIC, role_id, self.db)
         self.db.commit()
+        self.load_privilege_matrix()
+
+
+    def load_privilege_matrix(self) -> None:
+        privilege_matrix.load(self.db)
 
 
     def check_user_privilege(self, user, privilege_name: str) -> bool:
-        role = self.db.query(Role).filter(Role.name == user.role).first()
-        if not role:
-            return False
-        privileges = self.db.query(Privilege).join(RolePrivilege).filter(RolePrivilege.role_id == role.id).all()
-        return any(p.name == privilege_name for p in privileges)
\ No newline at end of file
+        if not privilege_matrix.loaded:
+            self.load_privilege_matrix()
+        return privilege_matrix.has(user.role, privilege_name)
+
+
+    # Create missing roles and privileges. A privilege is granted to its default roles only when it
+    # is created here, so grants revoked later are not restored on the next startup.
+    def seed_roles_and_privileges(self) -> None:
+        roles = {role.name: role for role in self.db.query(Role)}
+        for name in DEFAULT_ROLE_PRIVILEGES:
+            if name not in roles:
+                roles[name] = Role(name=name)
+                self.db.add(roles[name])
+        existing = {name for (name,) in self.db.query(Privilege.name)}
+        created = [Privilege(name=name, description=description) for name, description in PRIVILEGES.items() if name not in existing]
+        self.db.add_all(created)
+        # Assign ids before creating the grants
+        self.db.flush()
+        for privilege in created:
+            for role_name, granted in DEFAULT_ROLE_PRIVILEGES.items():
+                if privilege.name in granted:
+                    self.db.add(RolePrivilege(role_id=roles[role_name].id, privilege_id=privilege.id))
+        self.db.commit()
+
+
+class AsyncRoleService(AsyncService):
+    service_class = RoleService
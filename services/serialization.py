@@ -0,0 +1,38 @@
+import json
+from decimal import Decimal
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional: fall back to the stdlib encoder
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        number = float(value)
+        # orjson writes these without an exponent (0.00001); match the stdlib's repr (1e-05)
+        if orjson is not None and number != 0 and abs(number) < 1e-4:
+            return orjson.Fragment(json.dumps(number))
+        return number
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# Same bytes as FastAPI's JSONResponse.render for the equivalent Python content
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+# Fast path for list endpoints: `rows` come from a select of the response model's columns, in field
+# order, so they are encoded as they are instead of being validated row by row. With `fields`, only
+# that many leading columns are encoded (trailing ones, like updated_at for the ETag, are not).
+# Decimal becomes float and str enums their value, as the Pydantic response models do.
+def page_response(rows, next_cursor: str | None, fields: int | None = None) -> Response:
+    if rows and fields is not None:
+        names = rows[0]._fields[:fields]
+        items = [dict(zip(names, row)) for row in rows]
+    else:
+        items = [dict(zip(row._fields, row)) for row in rows]
+    return Response(dumps({"items": items, "next_cursor": next_cursor}), media_type="application/json")
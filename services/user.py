@@ -1,5 +1,15 @@
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from sqlalchemy import and_, case, delete, func, or_, select, union, update
 from sqlalchemy.orm import Session
+from cache import TTLCache, invalidation_channel
+from config.settings import settings
 from database.models.users import User
+from security import hash_password, password_hasher
+from services.base import AsyncService
+from services.pagination import PageRequest, encode_cursor, paginate
 from pydantic import BaseModel
 
 
@@ -16,15 +26,97 @@ class UserUpdate(BaseModel):
     email: str | None = None
 
 
+# Lightweight snapshot of an authenticated user: enough for identity and role checks
+@dataclass(frozen=True)
+class UserPrincipal:
+    id: int
+    username: str
+    email: str
+    role: str
+    # Version of the row the snapshot was taken from (ETag of /users/me)
+    updated_at: datetime | None = None
+
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserPrincipal":
+        return cls(id=user.id, username=user.username, email=user.email, role=user.role, updated_at=user.updated_at)
+
+
+# Per-process user id -> UserPrincipal cache used by get_current_user.
+# Writes go through it (cache_principal / invalidate_principal) after they commit, and are broadcast
+# to other workers (publish_principal_change, before the commit) when a cross-process invalidation
+# backend is configured.
+principal_cache = TTLCache(maxsize=settings.PRINCIPAL_CACHE_SIZE)
+PRINCIPAL_TOPIC = "principal"
+
+
+def cache_principal(user: User) -> UserPrincipal:
+    principal = UserPrincipal.from_user(user)
+    principal_cache.set(user.id, principal, expires_at=time.time() + settings.PRINCIPAL_CACHE_TTL_SECONDS)
+    return principal
+
+
+def invalidate_principal(user_id: int) -> None:
+    principal_cache.pop(user_id)
+
+
+# Sent on `db`'s transaction, so other workers hear of the change only once it is committed
+def publish_principal_change(db: Session, user_id: int) -> None:
+    invalidation_channel.publish(PRINCIPAL_TOPIC, user_id, db)
+
+
+# Other workers drop their copy; the next request reloads it from the database
+invalidation_channel.subscribe(PRINCIPAL_TOPIC, lambda key: principal_cache.pop(int(key)))
+
+
+# The fields of validators.users.UserResponse, in order (fast list serialization)
+USER_RESPONSE_COLUMNS = [User.id, User.username, User.email, User.role]
+
+# Search matches the lower-cased values, as indexed (ix_users_*_lower_pattern, ix_users_*_lower_trgm)
+USERNAME_LOWER = func.lower(User.username)
+EMAIL_LOWER = func.lower(User.email)
+LIKE_ESCAPE = "\\"
+
+
+def escape_like(value: str) -> str:
+    return value.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2).replace("%", LIKE_ESCAPE + "%").replace("_", LIKE_ESCAPE + "_")
+
+
+# A trigram to look up: pg_trgm extracts them from runs of letters and digits
+TRIGRAM = re.compile(r"[^\W_]{3}")
+
+
+# Conditions of a search for `term` (lower-cased), most relevant first: exact username or email, username
+# prefix, email prefix, then substring of either when the term has a trigram (without one the trigram
+# indexes have nothing to look up). Each comes with the condition its rows are looked up by.
+def search_ranks(term: str) -> list[tuple]:
+    prefix = escape_like(term) + "%"
+    ranks = [
+        or_(USERNAME_LOWER == term, EMAIL_LOWER == term),
+        USERNAME_LOWER.like(prefix, escape=LIKE_ESCAPE),
+        EMAIL_LOWER.like(prefix, escape=LIKE_ESCAPE),
+    ]
+    ranks = [(condition, condition) for condition in ranks]
+    if TRIGRAM.search(term):
+        contains = USERNAME_LOWER.like("%" + prefix, escape=LIKE_ESCAPE)
+        condition = lookup = or_(contains, EMAIL_LOWER.like("%" + prefix, escape=LIKE_ESCAPE))
+        local, at, _ = term.partition("@")
+        if at and TRIGRAM.search(local):
+            # Domains are shared by many users, so their trigrams match most rows: look the email up
+            # by the part before the '@' only; the rank condition checks the whole term
+            lookup = or_(contains, EMAIL_LOWER.like("%" + escape_like(local) + "@%", escape=LIKE_ESCAPE))
+        ranks.append((condition, lookup))
+    return ranks
+
+
 class UserService:
     def __init__(self, db: Session):
         self.db = db
 
 
-    def create_user(self, user_data: UserCreate) -> User:
-        from passlib.context import CryptContext
-        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-        hashed_password = pwd_context.hash(user_data.password)
+    def create_user(self, user_data: UserCreate, hashed_password: str | None = None) -> User:
+        if hashed_password is None:
+            hashed_password = hash_password(user_data.password)
         new_user = User(
             username=user_data.username,
             email=user_data.email,
@@ -33,7 +125,6 @@ class UserService:
         )
         self.db.add(new_user)
         self.db.commit()
-        self.db.refresh(new_user)
         return new_user
 
 
@@ -41,28 +132,80 @@ class UserService:
         return self.db.query(User).filter(User.id == user_id).first()
 
 
-    def update_user(self, user_id: int, update_data: UserUpdate) -> User | None:
-        user = self.get_user(user_id)
-        if not user:
+    def user_exists(self, user_id: int) -> bool:
+        return self.db.scalar(select(User.id).where(User.id == user_id)) is not None
+
+
+    # Single UPDATE ... RETURNING. With `actor_id` set (no users:write_all) only the actor's own row
+    # may change, which needs no statement to check. None means missing or not allowed; the caller
+    # tells those apart with user_exists on that path only.
+    def update_user(self, user_id: int, update_data: UserUpdate, actor_id: int | None = None) -> User | None:
+        if actor_id is not None and actor_id != user_id:
             return None
-        if update_data.username is not None:
-            user.username = update_data.username
-        if update_data.email is not None:
-            user.email = update_data.email
+        values = update_data.model_dump(exclude_none=True)
+        if values:
+            statement = update(User).where(User.id == user_id).values(**values).returning(User)
+        else:
+            statement = select(User).where(User.id == user_id)
+        user = self.db.scalars(statement.execution_options(populate_existing=True)).first()
+        if user is not None and values:
+            publish_principal_change(self.db, user.id)
         self.db.commit()
-        self.db.refresh(user)
+        if user is not None and values:
+            # Write-through: this worker serves the new snapshot, other workers reload theirs
+            cache_principal(user)
         return user
 
 
     def delete_user(self, user_id: int) -> bool:
-        user = self.get_user(user_id)
-        if not user:
-            return False
-        self.db.delete(user)
+        deleted = self.db.scalar(delete(User).where(User.id == user_id).returning(User.id)) is not None
+        if deleted:
+            publish_principal_change(self.db, user_id)
         self.db.commit()
-        return True
-
-
-
-    def list_users(self) -> list[User]:
-        return self.db.query(User).all()
\ No newline at end of file
+        if deleted:
+            invalidate_principal(user_id)
+        return deleted
+
+
+    # With `columns`, rows of just those columns are returned instead of User objects
+    def list_users(self, page: PageRequest, columns: list | None = None) -> tuple[list, str | None]:
+        return paginate(self.db.query(*(columns or [User])), User.id, page)
+
+
+    # Users matching `query`, ordered by (rank, id); rows of USER_RESPONSE_COLUMNS plus `rank`.
+    # One statement: a UNION with a branch per rank condition, each limited to limit + 1 rows by id, so no
+    # branch reads more than one page however many users match (an index scan by id that stops early when
+    # matches are common, the search indexes when they are rare). A branch also returns rows of better rank
+    # (an email prefix is often a username prefix too); those carry their own rank and, when they crowd out
+    # the branch's own rows, are enough to fill the page ahead of them.
+    def search_users(self, query: str, page: PageRequest) -> tuple[list, str | None]:
+        ranks = search_ranks(query.strip().lower())
+        rank = case(*((condition, index) for index, (condition, _) in enumerate(ranks)))
+        branches = []
+        for index, (_, lookup) in enumerate(ranks):
+            # This branch only finds rows ranked `index` or better: all on previous pages
+            if page.after_rank is not None and index < page.after_rank:
+                continue
+            branch = select(*USER_RESPONSE_COLUMNS, rank.label("rank")).where(lookup, rank <= index)
+            if page.after_rank is not None:
+                branch = branch.where(or_(rank > page.after_rank, and_(rank == page.after_rank, User.id > page.after_id)))
+            branches.append(select(branch.order_by(User.id).limit(page.limit + 1).subquery()))
+        if not branches:
+            return [], None
+        matches = union(*branches).subquery()
+        statement = select(matches).order_by(matches.c.rank, matches.c.id).limit(page.limit + 1)
+        rows = self.db.execute(statement).all()
+        if len(rows) <= page.limit:
+            return rows, None
+        rows = rows[:page.limit]
+        return rows, encode_cursor(rows[-1].id, rank=rows[-1].rank)
+
+
+class AsyncUserService(AsyncService):
+    service_class = UserService
+
+
+    async def create_user(self, user_data: UserCreate) -> User:
+        # Hash in the hashing pool, then insert with the precomputed hash
+        hashed_password = await password_hasher.hash_async(user_data.password)
+        return await self.db.run_sync(lambda session: UserService(session).create_user(user_data, hashed_password))
@@ -0,0 +1,147 @@
+import logging
+import re
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError, OperationalError, SQLAlchemyError
+from sqlalchemy.orm import Session
+from config.settings import settings
+from database.models import User
+from database.models.base import Base
+from services.order_partition import OrderPartitionService
+from services.role import RoleService
+from services.user import UserService, UserCreate
+
+logger = logging.getLogger("startup")
+
+MIGRATIONS_DIR = Path(__file__).parent / "database" / "migrations" / "versions"
+# Any constant shared by every process that starts the app or seeds
+STARTUP_LOCK_KEY = 0x5EED
+RACE_ATTEMPTS = 5
+
+_REVISION = re.compile(r"^revision(?::[^=]*)?=\s*['\"](\w+)['\"]", re.MULTILINE)
+_DOWN_REVISION = re.compile(r"^down_revision(?::[^=]*)?=(.*)$", re.MULTILINE)
+
+
+# Head revision(s) of the migration scripts, read straight from the files:
+# importing Alembic to ask it would add ~70 ms to every worker's start
+def migration_heads(directory: Path = MIGRATIONS_DIR) -> set[str]:
+    revisions, parents = set(), set()
+    for path in directory.glob("*.py"):
+        source = path.read_text()
+        revision = _REVISION.search(source)
+        if revision is None:
+            continue
+        revisions.add(revision.group(1))
+        down_revision = _DOWN_REVISION.search(source)
+        if down_revision is not None:
+            parents.update(re.findall(r"['\"](\w+)['\"]", down_revision.group(1)))
+    return revisions - parents
+
+
+# Revisions recorded in alembic_version, or None when the database is not managed by Alembic
+def database_revisions(conn) -> set[str] | None:
+    try:
+        return set(conn.scalars(text("SELECT version_num FROM alembic_version")))
+    except SQLAlchemyError:
+        conn.rollback()
+        return None
+
+
+# PostgreSQL session-level advisory lock held on `conn`; a no-op elsewhere
+@contextmanager
+def advisory_lock(conn, key: int):
+    if conn.dialect.name != "postgresql":
+        yield
+        return
+    conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": key})
+    conn.commit()
+    try:
+        yield
+    finally:
+        conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+        conn.commit()
+
+
+# Run idempotent startup work `fn(conn)` one worker at a time. On PostgreSQL workers take turns on the
+# advisory lock. Elsewhere (SQLite) a worker doing the same work at the same time may win a CREATE TABLE
+# or an insert; the work is rerun then and finds the other worker's tables and rows.
+def run_exclusive(engine, fn) -> None:
+    with engine.connect() as conn, advisory_lock(conn, STARTUP_LOCK_KEY):
+        for attempt in range(1, RACE_ATTEMPTS + 1):
+            try:
+                fn(conn)
+                return
+            except (IntegrityError, OperationalError):
+                conn.rollback()
+                if conn.dialect.name == "postgresql" or attempt == RACE_ATTEMPTS:
+                    raise
+                time.sleep(0.05 * attempt)
+
+
+def _create_all(conn) -> None:
+    Base.metadata.create_all(bind=conn)
+    conn.commit()
+
+
+# create_all reflects every table before creating the missing ones. With STARTUP_SCHEMA_CHECK a database
+# already at the Alembic head revision is taken as complete after a single query instead.
+def prepare_schema(engine) -> None:
+    if settings.STARTUP_SCHEMA_CHECK:
+        with engine.connect() as conn:
+            current = database_revisions(conn)
+        heads = migration_heads()
+        if current == heads:
+            return
+        if current:
+            logger.warning("Database is at revision %s, migrations are at %s: run `alembic upgrade head`",
+                           ", ".join(sorted(current)), ", ".join(sorted(heads)))
+    run_exclusive(engine, _create_all)
+
+
+# Ensure an admin user exists
+def seed_admin_user(db: Session) -> None:
+    if db.query(User.id).filter_by(username="admin").first() is None:
+        admin_data = UserCreate(
+            username="admin",
+            email="admin@example.com",
+            password="AdminPass123",
+            role="admin"
+        )
+        UserService(db).create_user(admin_data)
+        print("Admin user seeded.")
+    else:
+        print("Admin user already exists.")
+
+
+def _seed(conn) -> None:
+    db = Session(bind=conn, autoflush=False, expire_on_commit=False)
+    try:
+        RoleService(db).seed_roles_and_privileges()
+        seed_admin_user(db)
+    finally:
+        db.close()
+
+
+# Default roles, privileges and the admin user. Idempotent; workers starting together take turns,
+# so only the first one inserts (and pays for the bcrypt hash).
+def seed(engine) -> None:
+    run_exclusive(engine, _seed)
+
+
+def _create_order_partitions(conn) -> None:
+    db = Session(bind=conn, expire_on_commit=False)
+    try:
+        created = OrderPartitionService(db).ensure(settings.ORDER_PARTITION_MONTHS_AHEAD)
+    finally:
+        db.close()
+    if created:
+        logger.info("Created order partitions %s", ", ".join(created))
+
+
+# The month partitions of orders up to ORDER_PARTITION_MONTHS_AHEAD months ahead (PostgreSQL, once orders is
+# partitioned), so new orders never land in the default partition. A few catalog queries when they exist.
+def create_order_partitions(engine) -> None:
+    if settings.ORDER_PARTITION_MONTHS_AHEAD > 0 and engine.dialect.name == "postgresql":
+        run_exclusive(engine, _create_order_partitions)
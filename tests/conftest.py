@@ -0,0 +1,57 @@
+import itertools
+import os
+import tempfile
+import pytest
+
+# The app reads its settings at import time. Tests run against a throwaway database: TEST_DATABASE_URL
+# (e.g. a local PostgreSQL database created for the run) or a temporary SQLite file.
+os.environ["DATABASE_URL"] = os.environ.get("TEST_DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp()}/test.db"
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+os.environ.setdefault("JWT_REFRESH_SECRET_KEY", "test-refresh-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ.setdefault("REFRESH_TOKEN_EXPIRE_MINUTES", "60")
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+# Statement counts are read from the Server-Timing header (database.instrumentation.assert_query_budget)
+os.environ["DB_SERVER_TIMING"] = "true"
+
+ADMIN = {"username": "admin", "password": "AdminPass123"}
+CUSTOMER_PASSWORD = "CustomerPass123"
+_customer_numbers = itertools.count(1)
+
+
+# The app, with its schema and seed data created by the lifespan
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+def login(client, username: str, password: str) -> dict:
+    tokens = client.post("/auth/", data={"username": username, "password": password}).json()
+    return {"Authorization": f"Bearer {tokens['access_token']}"}
+
+
+@pytest.fixture(scope="session")
+def admin_headers(client) -> dict:
+    return login(client, **ADMIN)
+
+
+# Creates customers: make_customer() -> (user id, auth headers)
+@pytest.fixture
+def make_customer(client, admin_headers):
+    def make() -> tuple[int, dict]:
+        username = f"customer_{next(_customer_numbers)}"
+        body = {"username": username, "email": f"{username}@example.com", "password": CUSTOMER_PASSWORD}
+        user = client.post("/users/", json=body, headers=admin_headers)
+        assert user.status_code == 201, user.text
+        return user.json()["id"], login(client, username, CUSTOMER_PASSWORD)
+    return make
+
+
+@pytest.fixture
+def customer(make_customer) -> tuple[int, dict]:
+    return make_customer()
@@ -0,0 +1,54 @@
+"""Cross-process invalidation of cached principals.
+
+Changes are published on the writer's transaction (PostgreSQL delivers a NOTIFY on commit), and a
+worker's listener skips its own messages so the snapshot it wrote through stays cached.
+"""
+import pytest
+from cache import InvalidationChannel, PgNotifyBackend, invalidation_channel
+from services.user import PRINCIPAL_TOPIC, principal_cache
+
+
+# Records what is published and whether the session was inside a transaction at the time
+class RecordingBackend:
+    def __init__(self):
+        self.messages = []
+
+
+    def publish(self, topic: str, key: str, db=None) -> None:
+        self.messages.append((topic, key, db is not None and db.in_transaction()))
+
+
+@pytest.fixture
+def backend(monkeypatch) -> RecordingBackend:
+    backend = RecordingBackend()
+    monkeypatch.setattr(invalidation_channel, "backend", backend)
+    return backend
+
+
+def test_update_user_publishes_before_commit(client, customer, admin_headers, backend):
+    user_id, _ = customer
+    email = f"renamed_{user_id}@example.com"
+    response = client.put(f"/users/{user_id}", json={"email": email}, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    assert backend.messages == [(PRINCIPAL_TOPIC, str(user_id), True)]
+    # Written through on this worker
+    assert principal_cache.get(user_id).email == email
+
+
+def test_delete_user_publishes_before_commit(client, customer, admin_headers, backend):
+    user_id, headers = customer
+    assert client.get("/users/me", headers=headers).status_code == 200
+    response = client.delete(f"/users/{user_id}", headers=admin_headers)
+    assert response.status_code == 200, response.text
+    assert backend.messages == [(PRINCIPAL_TOPIC, str(user_id), True)]
+    assert principal_cache.get(user_id) is None
+
+
+def test_listener_skips_its_own_messages():
+    channel = InvalidationChannel()
+    received = []
+    channel.subscribe("topic", received.append)
+    backend = PgNotifyBackend(engine=None, channel="invalidations", target=channel)
+    backend.receive(f"{backend.origin}:topic:1")
+    backend.receive("another-process:topic:2")
+    assert received == ["2"]
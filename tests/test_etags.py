@@ -0,0 +1,62 @@
+"""Conditional GETs after an update.
+
+updated_at has a one-second resolution on SQLite, so each test puts it back to its value before the
+update: the ETag must still change, from the fields the update changed.
+"""
+import pytest
+from sqlalchemy import update
+from database.database import SessionLocal
+from database.models import Order, User
+from services.user import principal_cache
+
+
+# An update within the same second as the previous write: updated_at does not move
+def same_second_update(model, row_id: int, write) -> None:
+    with SessionLocal() as db:
+        previous = db.get(model, row_id).updated_at
+    response = write()
+    assert response.status_code == 200, response.text
+    with SessionLocal() as db:
+        db.execute(update(model).where(model.id == row_id).values(updated_at=previous))
+        db.commit()
+
+
+@pytest.fixture
+def order(client, customer) -> dict:
+    response = client.post("/orders/", json={"total_amount": 12.5}, headers=customer[1])
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+@pytest.mark.parametrize("path", ["/orders/{id}", "/orders/me"])
+def test_order_update_changes_etag(client, customer, order, path):
+    url = path.format(id=order["id"])
+    etag = client.get(url, headers=customer[1]).headers["ETag"]
+
+    same_second_update(Order, order["id"], lambda: client.put(f"/orders/{order['id']}", json={"status": "completed"}, headers=customer[1]))
+
+    response = client.get(url, headers={**customer[1], "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    body = response.json()
+    assert (body if path == "/orders/{id}" else body["items"][0])["status"] == "completed"
+
+
+def test_order_unchanged_is_not_modified(client, customer, order):
+    etag = client.get(f"/orders/{order['id']}", headers=customer[1]).headers["ETag"]
+    response = client.get(f"/orders/{order['id']}", headers={**customer[1], "If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_user_update_changes_etag(client, customer, admin_headers):
+    user_id, headers = customer
+    etag = client.get("/users/me", headers=headers).headers["ETag"]
+
+    same_second_update(User, user_id, lambda: client.put(f"/users/{user_id}", json={"email": f"changed_{user_id}@example.com"}, headers=admin_headers))
+    # Reload the snapshot from the row as it is now
+    principal_cache.pop(user_id)
+
+    response = client.get("/users/me", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["email"] == f"changed_{user_id}@example.com"
@@ -0,0 +1,90 @@
+"""Statement counts of the ownership-scoped order and user mutations.
+
+Each mutation puts the ownership check into its statement, so a successful one is exactly one
+statement on PostgreSQL (order changes update user_order_summary and order_rollups in the same
+statement). SQLite has no data-modifying WITH: there a successful order update also reads the order
+first and updates the summary and rollups after it, and a delete updates them after it. Only a
+mutation that matched nothing looks the row up again, to answer 404 or 403.
+"""
+import pytest
+from database.database import engine
+from database.instrumentation import assert_query_budget
+
+# Statements of a successful order update and delete on SQLite
+SQLITE_ORDER_STATEMENTS = {"PUT": 4, "DELETE": 3}
+MISSING_ID = 10**9
+
+
+def order_statements(method: str) -> int:
+    return 1 if engine.dialect.name == "postgresql" else SQLITE_ORDER_STATEMENTS[method]
+
+
+# Load the caller's principal and the privilege matrix, so the measured request only runs its mutation
+def warm_up(client, headers: dict) -> None:
+    assert client.get("/users/me", headers=headers).status_code == 200
+
+
+def measure(client, method: str, path: str, headers: dict, **kwargs):
+    warm_up(client, headers)
+    return client.request(method, path, headers=headers, **kwargs)
+
+
+@pytest.fixture
+def order(client, customer) -> dict:
+    response = client.post("/orders/", json={"total_amount": 12.5}, headers=customer[1])
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+@pytest.mark.parametrize("as_admin", [False, True], ids=["owner", "admin"])
+def test_update_order(client, customer, admin_headers, order, as_admin):
+    headers = admin_headers if as_admin else customer[1]
+    response = measure(client, "PUT", f"/orders/{order['id']}", headers, json={"status": "completed"})
+    assert response.status_code == 200, response.text
+    assert response.json()["status"] == "completed"
+    assert_query_budget(response, order_statements("PUT"), exact=True)
+
+
+@pytest.mark.parametrize("as_admin", [False, True], ids=["owner", "admin"])
+def test_delete_order(client, customer, admin_headers, order, as_admin):
+    headers = admin_headers if as_admin else customer[1]
+    response = measure(client, "DELETE", f"/orders/{order['id']}", headers)
+    assert response.status_code == 200, response.text
+    assert_query_budget(response, order_statements("DELETE"), exact=True)
+
+
+# The scoped statement matches nothing; one lookup by id then tells 403 from 404
+@pytest.mark.parametrize("method", ["PUT", "DELETE"])
+def test_order_mutation_not_matched(client, make_customer, order, method):
+    _, headers = make_customer()
+    body = {"json": {"status": "cancelled"}} if method == "PUT" else {}
+    for order_id, expected in [(order["id"], 403), (MISSING_ID, 404)]:
+        response = measure(client, method, f"/orders/{order_id}", headers, **body)
+        assert response.status_code == expected, response.text
+        assert_query_budget(response, 2, exact=True)
+
+
+@pytest.mark.parametrize("as_admin", [False, True], ids=["self", "admin"])
+def test_update_user(client, customer, admin_headers, as_admin):
+    user_id, headers = customer
+    email = f"updated_{user_id}@example.com"
+    response = measure(client, "PUT", f"/users/{user_id}", admin_headers if as_admin else headers, json={"email": email})
+    assert response.status_code == 200, response.text
+    assert response.json()["email"] == email
+    assert_query_budget(response, 1, exact=True)
+
+
+# A customer may only update themself, so the UPDATE is skipped and only the lookup runs
+def test_update_user_not_matched(client, customer, make_customer):
+    _, headers = make_customer()
+    for user_id, expected in [(customer[0], 403), (MISSING_ID, 404)]:
+        response = measure(client, "PUT", f"/users/{user_id}", headers, json={"username": "taken_over"})
+        assert response.status_code == expected, response.text
+        assert_query_budget(response, 1, exact=True)
+
+
+@pytest.mark.parametrize("user_id, expected", [(None, 200), (MISSING_ID, 404)], ids=["existing", "missing"])
+def test_delete_user(client, customer, admin_headers, user_id, expected):
+    response = measure(client, "DELETE", f"/users/{user_id or customer[0]}", admin_headers)
+    assert response.status_code == expected, response.text
+    assert_query_budget(response, 1, exact=True)
@@ -0,0 +1,19 @@
+from datetime import datetime
+from pydantic import BaseModel
+from config.settings import RollupGranularity
+from validators.orders import OrderStatusTotals
+
+
+class OrderBucket(BaseModel):
+    bucket_start: datetime
+    order_count: int
+    total_amount: float
+    by_status: dict[str, OrderStatusTotals]
+
+
+# Order counts and amounts per bucket, oldest first, every bucket of the range included
+class OrderRollupResponse(BaseModel):
+    granularity: RollupGranularity
+    date_from: datetime
+    date_to: datetime
+    buckets: list[OrderBucket]
@@ -1,13 +1,16 @@
-from pydantic import BaseModel
+from typing import Any
+from datetime import datetime
+from pydantic import BaseModel, Field, model_validator
+from config.settings import OrderStatus, settings
 
 
 class OrderCreate(BaseModel):
     total_amount: float
-    status: str = "pending"
+    status: OrderStatus = OrderStatus.pending
 
 
 class OrderUpdate(BaseModel):
-    status: str | None = None
+    status: OrderStatus | None = None
 
 
 class OrderResponse(BaseModel):
@@ -18,4 +21,78 @@ class OrderResponse(BaseModel):
 
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+
+# One page of orders; pass next_cursor back as ?cursor= to fetch the following page
+class OrderPage(BaseModel):
+    items: list[OrderResponse]
+    next_cursor: str | None = None
+
+
+
+class OrderStatusTotals(BaseModel):
+    count: int
+    total_amount: float
+
+
+# A user's order totals, read from their user_order_summary row
+class OrderSummaryResponse(BaseModel):
+    user_id: int
+    order_count: int
+    total_amount: float
+    last_order_at: datetime | None = None
+    by_status: dict[str, OrderStatusTotals]
+
+
+
+# Items are validated one by one so a bad item is reported instead of rejecting the whole batch
+class OrderBatchCreate(BaseModel):
+    items: list[dict[str, Any]] = Field(min_length=1, max_length=settings.ORDER_BATCH_MAX_ITEMS)
+
+
+class OrderBatchError(BaseModel):
+    index: int
+    errors: list[dict[str, Any]]
+
+
+class OrderBatchResponse(BaseModel):
+    created: list[OrderResponse]
+    errors: list[OrderBatchError]
+
+
+
+# Orders selected by a bulk status transition when no explicit ids are given. At least one criterion
+# is required: an empty filter would select every order.
+class OrderBulkFilter(BaseModel):
+    user_id: int | None = None
+    status: OrderStatus | None = None
+    date_from: datetime | None = None
+    date_to: datetime | None = None
+
+
+    @model_validator(mode="after")
+    def check_criteria(self):
+        if not self.model_dump(exclude_none=True):
+            raise ValueError("Provide at least one of 'user_id', 'status', 'date_from' or 'date_to'")
+        return self
+
+
+# Exactly one of `ids` or `filter` selects the orders to move to `target_status`
+class OrderBulkStatusUpdate(BaseModel):
+    target_status: OrderStatus
+    ids: list[int] | None = Field(None, min_length=1, max_length=settings.ORDER_BULK_MAX_IDS)
+    filter: OrderBulkFilter | None = None
+
+
+    @model_validator(mode="after")
+    def check_selection(self):
+        if (self.ids is None) == (self.filter is None):
+            raise ValueError("Provide exactly one of 'ids' or 'filter'")
+        return self
+
+
+class OrderBulkStatusResponse(BaseModel):
+    target_status: OrderStatus
+    count: int
+    updated_ids: list[int]
@@ -22,4 +22,10 @@ class UserResponse(BaseModel):
 
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+
+# One page of users; pass next_cursor back as ?cursor= to fetch the following page
+class UserPage(BaseModel):
+    items: list[UserResponse]
+    next_cursor: str | None = None